@@ -1,19 +1,17 @@
-import sqlite3 
 import functools
 
+from cache_layer import track_writes
+from db_pool import get_pool
+
 def with_db_connection(func):
-    """Decorator that opens an SQLite connection, passes it to the function,
-    and ensures the connection is closed afterward."""
+    """Borrow an SQLite connection to users.db from the shared pool (db_pool.py),
+    pass it as first arg `conn`, and return it after (uncommitted work is
+    rolled back, as close() did). Writes on it invalidate cache_query
+    results for the tables they touch (track_writes runs once per connection)."""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool('users.db', on_open=track_writes).connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
     return wrapper
 
 def transactional(func):
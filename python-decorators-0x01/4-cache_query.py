@@ -1,39 +1,106 @@
-import time
-import sqlite3 
 import functools
+import inspect
 
+from cache_layer import MISS, QueryCache, SingleFlight, default_backend, make_key, track_writes
+from db_pool import get_pool
 
 
 # ---- with_db_connection (from previous task) ----
 def with_db_connection(func):
-    """Open an SQLite connection, pass it as first arg `conn`, and close it after."""
+    """Borrow an SQLite connection to users.db from the shared pool (db_pool.py),
+    pass it as first arg `conn`, and return it after (uncommitted work is
+    rolled back, as close() did). Writes on it invalidate cache_query
+    results for the tables they touch (track_writes runs once per connection)."""
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        with get_pool('users.db', on_open=track_writes).connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
     return wrapper
 
 # ---- cache_query (new decorator) ----
-query_cache = {}
-def cache_query(func):
-    """Cache the results of the decorated function based on its query argument."""
+# Bounded LRU/TTL cache keyed by normalized query + parameters (cache_layer.py);
+# entries go stale when a tracked connection writes to a table they read.
+# In-process by default; set QUERY_CACHE_PATH=/path/to/cache.sqlite to share
+# one cache between all worker processes on the host (shared_cache.py).
+query_cache = default_backend(max_entries=256, max_bytes=16 * 1024 * 1024, ttl=300.0)
+
+
+def _query_and_params(args, kwargs):
+    """The `query` (keyword or first str positional) and the `params` after it."""
+    query = kwargs.get("query")
+    params = kwargs.get("params")
+    if query is None:
+        for i, arg in enumerate(args):
+            if isinstance(arg, str):
+                query = arg
+                if params is None and i + 1 < len(args):
+                    params = args[i + 1]
+                break
+    return query, params
+
+
+def cache_query(func=None, *, cache=None, single_flight=True):
+    """Cache the results of the decorated function based on its query and parameters.
+
+    Concurrent misses for the same key run the function once and share its
+    result (single_flight=False lets every caller run it). Works on plain
+    and coroutine functions; use @cache_query(cache=QueryCache(...)) for a
+    cache other than the module's query_cache (any cache_layer.CacheBackend).
+    """
+    if func is None:
+        return lambda f: cache_query(f, cache=cache, single_flight=single_flight)
+    flights = SingleFlight() if single_flight else None
+
+    def store():
+        # Resolved per call so rebinding the module's query_cache takes effect
+        return cache if cache is not None else query_cache
+
+    def lookup(args, kwargs):
+        query, params = _query_and_params(args, kwargs)
+        if query is None:
+            return query, None, MISS
+        key = make_key(query, params)
+        result = store().get(key)
+        if result is not MISS:
+            print(f"[CACHE HIT] Returning cached results for query: {query}")
+        return query, key, result
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query, key, result = lookup(args, kwargs)
+            if query is None:
+                return await func(*args, **kwargs)
+            if result is not MISS:
+                return result
+
+            async def run():
+                target = store()
+                deps = target.dependencies(query)
+                result = await func(*args, **kwargs)
+                target.put(key, result, deps)
+                return result
+            return await (flights.do_async(key, run) if flights else run())
+        async_wrapper.flights = flights
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        query = kwargs.get("query")
-        if query is None and args:
-            query = args[0] if isinstance(args[0], str) else None
-        if query in query_cache:
-            print(f"[CACHE HIT] Returning cached results for query: {query}")
-            return query_cache[query]
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        return result
+        query, key, result = lookup(args, kwargs)
+        if query is None:
+            return func(*args, **kwargs)
+        if result is not MISS:
+            return result
+
+        def run():
+            target = store()
+            # Versions as of before the read: a write racing with it makes the entry stale
+            deps = target.dependencies(query)
+            result = func(*args, **kwargs)
+            target.put(key, result, deps)
+            return result
+        return flights.do(key, run) if flights else run()
+    wrapper.flights = flights
     return wrapper
 
 @with_db_connection
@@ -43,8 +110,9 @@ def fetch_users_with_cache(conn, query):
     cursor.execute(query)
     return cursor.fetchall()
 
-#### First call will cache the result
-users = fetch_users_with_cache(query="SELECT * FROM users")
+if __name__ == "__main__":
+    #### First call will cache the result
+    users = fetch_users_with_cache(query="SELECT * FROM users")
 
-#### Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users")
\ No newline at end of file
+    #### Second call will use the cached result
+    users_again = fetch_users_with_cache(query="SELECT * FROM users")
\ No newline at end of file
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+"""
+benchmark.py
+
+Measurements for the cache_query decorator (4-cache_query.py). Each run
+uses its own temporary SQLite database of synthetic users.
+
+- bench_contention(callers, rounds, rows): `callers` threads miss a cold
+  cache on the same query at the same moment, with and without
+  single-flight; reports query executions and wall time per round.
+- bench_contention_async(callers, rounds, rows): the same with coroutines
+  (the query runs in a worker thread via asyncio.to_thread).
+- bench_connection_overhead(calls, rows): per-call cost of a decorated
+  single-row lookup with a new connection per call (the original
+  with_db_connection) vs a db_pool.SQLitePool, bounded and per-thread.
+
+    python3 benchmark.py --callers 32 --rounds 20 --rows 20000
+    python3 benchmark.py --only connections --calls 20000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from cache_layer import QueryCache
+from db_pool import SQLitePool
+
+_cache_query = __import__("4-cache_query").cache_query
+
+QUERY = "SELECT * FROM users ORDER BY email"
+
+
+def create_users_db(path: str, rows: int) -> None:
+    """A users table shaped like the project's users.db with `rows` rows."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+        conn.executemany(
+            "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+            ((f"user{i}", f"user{(i * 7919) % rows}@example.com", 18 + i % 60) for i in range(rows)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _fetcher(db_path: str, cache: QueryCache, single_flight: bool, counter: List[int]):
+    lock = threading.Lock()
+
+    @_cache_query(cache=cache, single_flight=single_flight)
+    def fetch(conn, query):
+        with lock:
+            counter[0] += 1
+        return conn.execute(query).fetchall()
+
+    def call(query: str):
+        conn = sqlite3.connect(db_path)
+        try:
+            return fetch(conn, query)
+        finally:
+            conn.close()
+    return call
+
+
+def _report(label: str, executions: int, seconds: float, rounds: int, callers: int) -> None:
+    print(f"{label:>18}: {executions / rounds:6.1f} queries/round for {callers} callers, "
+          f"{seconds / rounds * 1000:8.2f} ms/round")
+
+
+def bench_contention(callers: int = 32, rounds: int = 20, rows: int = 20000
+                     ) -> Dict[str, Dict[str, float]]:
+    """
+    For each round: a cold cache, `callers` threads released together by a
+    barrier, each calling the cached fetch once. Returns executions and
+    seconds (totals over all rounds) per mode.
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "users.db")
+        create_users_db(db_path, rows)
+        for label, single_flight in (("no coalescing", False), ("single-flight", True)):
+            counter, seconds = [0], 0.0
+            for _ in range(rounds):
+                call = _fetcher(db_path, QueryCache(), single_flight, counter)
+                barrier = threading.Barrier(callers + 1)
+
+                def worker():
+                    barrier.wait()
+                    call(QUERY)
+                threads = [threading.Thread(target=worker) for _ in range(callers)]
+                for thread in threads:
+                    thread.start()
+                start = time.perf_counter()
+                barrier.wait()
+                for thread in threads:
+                    thread.join()
+                seconds += time.perf_counter() - start
+            results[label] = {"executions": counter[0], "seconds": seconds}
+            _report(label, counter[0], seconds, rounds, callers)
+    return results
+
+
+def bench_contention_async(callers: int = 32, rounds: int = 20, rows: int = 20000
+                           ) -> Dict[str, Dict[str, float]]:
+    """bench_contention() with `callers` coroutines gathered on one event loop."""
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "users.db")
+        create_users_db(db_path, rows)
+
+        def query_db(query: str):
+            conn = sqlite3.connect(db_path)
+            try:
+                return conn.execute(query).fetchall()
+            finally:
+                conn.close()
+
+        async def run_rounds(single_flight: bool, counter: List[int]) -> float:
+            seconds = 0.0
+            for _ in range(rounds):
+                @_cache_query(cache=QueryCache(), single_flight=single_flight)
+                async def fetch(query):
+                    counter[0] += 1
+                    return await asyncio.to_thread(query_db, query)
+                start = time.perf_counter()
+                await asyncio.gather(*(fetch(QUERY) for _ in range(callers)))
+                seconds += time.perf_counter() - start
+            return seconds
+
+        for label, single_flight in (("no coalescing", False), ("single-flight", True)):
+            counter = [0]
+            seconds = asyncio.run(run_rounds(single_flight, counter))
+            results[label] = {"executions": counter[0], "seconds": seconds}
+            _report(label, counter[0], seconds, rounds, callers)
+    return results
+
+
+def bench_connection_overhead(calls: int = 20000, rows: int = 20000) -> Dict[str, Dict[str, float]]:
+    """
+    `calls` primary-key lookups, each through a decorator that supplies the
+    connection: connect/close per call, then a bounded and a per-thread
+    pool. Returns microseconds per call and the pool stats per mode.
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "users.db")
+        create_users_db(db_path, rows)
+
+        def connect_per_call(user_id):
+            conn = sqlite3.connect(db_path)
+            try:
+                return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+            finally:
+                conn.close()
+
+        def pooled(pool):
+            def call(user_id):
+                with pool.connection() as conn:
+                    return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+            return call
+
+        pools = {"bounded pool": SQLitePool(db_path, size=5),
+                 "per-thread pool": SQLitePool(db_path, per_thread=True)}
+        modes = {"connect per call": connect_per_call,
+                 **{label: pooled(pool) for label, pool in pools.items()}}
+        for label, call in modes.items():
+            start = time.perf_counter()
+            for i in range(calls):
+                call(1 + i % rows)
+            per_call = (time.perf_counter() - start) / calls * 1e6
+            results[label] = {"us_per_call": per_call}
+            pool = pools.get(label)
+            if pool is not None:
+                results[label]["pool"] = pool.stats()
+                pool.close_all()
+            print(f"{label:>18}: {per_call:8.1f} us/call")
+        baseline = results["connect per call"]["us_per_call"]
+        for label in pools:
+            print(f"{label:>18}: {baseline / results[label]['us_per_call']:.1f}x faster per call")
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[..., Dict[str, Dict[str, float]]]] = {
+    "threads": bench_contention,
+    "async": bench_contention_async,
+    "connections": bench_connection_overhead,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark cache_query under contention.")
+    parser.add_argument("--callers", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--calls", type=int, default=20000,
+                        help="lookups per mode for the connections benchmark")
+    parser.add_argument("--only", choices=sorted(BENCHMARKS), help="run a single benchmark")
+    args = parser.parse_args(argv)
+    for name, bench in BENCHMARKS.items():
+        if args.only and name != args.only:
+            continue
+        print(f"[{name}]")
+        # cache_query prints a line per hit; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()) as quiet:
+            if bench is bench_connection_overhead:
+                bench(args.calls, args.rows)
+            else:
+                bench(args.callers, args.rounds, args.rows)
+        print("\n".join(line for line in quiet.getvalue().splitlines()
+                        if not line.startswith("[CACHE HIT]")))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,433 @@
+#!/usr/bin/python3
+"""
+cache_layer.py
+
+Bounded result cache for the cache_query decorator.
+
+- make_key(query, params): cache key from the normalized SQL and its parameters
+- QueryCache(max_entries, max_bytes, ttl): LRU cache bounded by entry count
+  and estimated result size, with a per-entry time to live and counters
+- SingleFlight: concurrent misses on one key run the query once (threads
+  via do(), coroutines via do_async()) and share its result
+- CacheBackend: the interface cache_query uses; QueryCache is the in-process
+  implementation, shared_cache.SQLiteCache one shared by every process on
+  the host (default_backend() picks it when QUERY_CACHE_PATH is set)
+
+Write-aware invalidation: every cached result records the version of each
+table its query reads (tables_read). track_writes(conn) installs a trace
+callback on an sqlite3 connection that bumps a table's version when a
+statement writes to it, and again when the transaction commits or rolls
+back. A lookup whose recorded versions are no longer current is a miss and
+the stale entry is dropped then. Only writes made through tracked
+connections (with_db_connection) are seen. With QUERY_CACHE_PATH set the
+versions live in that file too, so a write tracked in one process
+invalidates the results cached by all of them; otherwise writes by other
+processes are bounded by the TTL alone.
+"""
+
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import (Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable,
+                    NamedTuple, Optional, Tuple)
+
+# Quoted literals/identifiers are kept verbatim; whitespace runs elsewhere collapse
+_TOKENS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])|\s+""")
+
+CACHE_PATH_ENV = "QUERY_CACHE_PATH"  # SQLite file for the host-wide shared cache
+
+MISS = object()  # QueryCache.get() result when the key is not cached
+ANY_TABLE = "*"  # dependency of queries whose tables could not be parsed
+
+_NAME = r"""(?:"(?:[^"]|"")+"|`[^`]+`|\[[^\]]+\]|[\w$]+)"""
+_IDENT = _NAME + r"(?:\s*\.\s*" + _NAME + ")?"  # [schema.]table
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+# FROM <list up to the next clause>, JOIN <table>
+_FROM = re.compile(
+    r"\bFROM\s+(.*?)(?=\b(?:WHERE|GROUP|ORDER|LIMIT|HAVING|WINDOW|UNION|EXCEPT|INTERSECT"
+    r"|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|NATURAL|ON|USING|SELECT|FROM|VALUES)\b|[()]|;|$)",
+    re.I | re.S)
+_JOIN = re.compile(r"\bJOIN\s+(" + _IDENT + ")", re.I)
+_WRITE = re.compile(
+    r"\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM"
+    r"|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE|CREATE\s+(?:TEMP(?:ORARY)?\s+)?TABLE"
+    r"(?:\s+IF\s+NOT\s+EXISTS)?|TRUNCATE(?:\s+TABLE)?)\s+(" + _IDENT + ")", re.I)
+_TXN_END = re.compile(r"\s*(?:COMMIT|END|ROLLBACK)\b", re.I)
+
+
+def normalize_query(query: str) -> str:
+    """`query` with whitespace collapsed outside literals and no trailing ';'."""
+    sql = _TOKENS.sub(lambda m: m.group(1) or " ", query).strip()
+    return sql.rstrip(";").rstrip()
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return value
+
+
+def make_key(query: str, params: Any = None) -> Tuple[str, Hashable]:
+    """
+    Cache key for `query` run with `params` (a sequence for ? placeholders,
+    a dict for :name placeholders, or None). Queries differing only in
+    whitespace or a trailing ';' share a key; the same query with
+    different parameters does not. (1 and 1.0 compare equal, as in SQL.)
+    """
+    return normalize_query(query), _freeze(params) if params is not None else ()
+
+
+def _table_name(ident: str) -> str:
+    """Lower-case table name of a possibly quoted, schema-qualified identifier."""
+    name = re.findall(_NAME, ident)[-1]
+    if name[0] in "\"`[":
+        name = name[1:-1].replace('""', '"')
+    return name.lower()
+
+
+def _strip(sql: str) -> str:
+    return _STRING.sub("''", _COMMENT.sub(" ", sql))
+
+
+def tables_read(query: str) -> FrozenSet[str]:
+    """
+    Tables named after FROM (including comma lists) or JOIN anywhere in
+    `query`, subqueries included. CTE names and table functions may be
+    listed too; they only make the dependency set larger.
+    """
+    sql = _strip(query)
+    tables = set()
+    for clause in _FROM.finditer(sql):
+        for item in clause.group(1).split(","):
+            match = re.match(r"\s*(" + _IDENT + ")", item)
+            if match:
+                tables.add(_table_name(match.group(1)))
+    tables.update(_table_name(m.group(1)) for m in _JOIN.finditer(sql))
+    return frozenset(tables)
+
+
+def tables_written(statement: str) -> FrozenSet[str]:
+    """Tables an INSERT/REPLACE/UPDATE/DELETE or table DDL statement modifies."""
+    return frozenset(_table_name(m.group(1)) for m in _WRITE.finditer(_strip(statement)))
+
+
+class TableVersions:
+    """Per-table write counters; bumping any table also bumps ANY_TABLE."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, tables: Iterable[str]) -> None:
+        with self._lock:
+            for table in {*tables, ANY_TABLE}:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def current(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        """(table, version) pairs for `tables` (ANY_TABLE if there are none)."""
+        return tuple((table, self.current(table)) for table in sorted(tables) or [ANY_TABLE])
+
+
+table_versions = TableVersions()  # shared by every tracked connection in the process
+
+
+def default_versions():
+    """The versions track_writes() bumps by default: the shared file's when
+    QUERY_CACHE_PATH is set, else the in-process table_versions."""
+    path = os.environ.get(CACHE_PATH_ENV)
+    if not path:
+        return table_versions
+    from shared_cache import shared_versions  # shared_cache imports this module
+    return shared_versions(path)
+
+
+def track_writes(conn, versions: Optional[TableVersions] = None):
+    """
+    Bump table versions for the writes executed on the sqlite3 connection
+    `conn`: once when a statement modifies a table (so reads on the same
+    connection see their own writes) and again when the transaction ends
+    (so results other connections read before the COMMIT, or this one read
+    before a ROLLBACK, go stale). Replaces any trace callback on `conn`.
+    Returns `conn`.
+    """
+    versions = versions if versions is not None else default_versions()
+    pending = set()
+
+    def trace(statement: str) -> None:
+        written = tables_written(statement)
+        if written:
+            pending.update(written)
+            versions.bump(written)
+        elif pending and _TXN_END.match(statement):
+            versions.bump(pending)
+            pending.clear()
+
+    conn.set_trace_callback(trace)
+    return conn
+
+
+def estimate_size(value: Any) -> int:
+    """Rough in-memory size of a result (a list of row tuples), in bytes."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            size += estimate_size(item)
+    return size
+
+
+class _Entry(NamedTuple):
+    value: Any
+    size: int
+    expires: float
+    deps: Tuple[Tuple[str, int], ...]
+
+
+class CacheBackend(ABC):
+    """
+    What cache_query needs from a cache. Keys come from make_key(); `deps`
+    from dependencies(query), taken before the query runs; `versions` is
+    the TableVersions-like object whose bumps make entries stale.
+    """
+
+    versions: Any
+
+    def dependencies(self, query: str) -> Tuple[Tuple[str, int], ...]:
+        """Current versions of the tables `query` reads; pass to put() as `deps`."""
+        return self.versions.snapshot(tables_read(query))
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Any:
+        """The cached value for `key`, or MISS (expired and stale entries miss)."""
+
+    @abstractmethod
+    def put(self, key: Hashable, value: Any, deps: Tuple[Tuple[str, int], ...] = ()) -> bool:
+        """Store `value`; False if it was not stored (too big)."""
+
+    @abstractmethod
+    def invalidate(self, key: Hashable) -> None:
+        """Drop `key` if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every entry."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """At least hits, misses, evictions, expirations, invalidations,
+        entries, bytes and hit_rate."""
+
+
+class QueryCache(CacheBackend):
+    """
+    LRU cache of query results, bounded by `max_entries` and by the
+    estimated size of the stored results (`max_bytes`). Entries older
+    than `ttl` seconds (None = never) are treated as missing and dropped
+    when next looked up. A result larger than `max_bytes` is not stored.
+
+    Entries stored with `deps` (from dependencies(), taken before the query
+    ran) are stale once any of those table versions has moved on; a stale
+    entry counts as a miss and an invalidation and is dropped.
+
+    Cached results are returned as-is (not copied), so callers must not
+    mutate them. Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024,
+                 ttl: Optional[float] = 300.0, clock: Callable[[], float] = time.monotonic,
+                 versions: Optional[TableVersions] = None):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries and max_bytes must be positive")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive seconds or None")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self.versions = versions if versions is not None else table_versions
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def _fresh(self, entry: _Entry) -> bool:
+        return all(self.versions.current(table) == version for table, version in entry.deps)
+
+    def get(self, key: Hashable) -> Any:
+        """The cached value for `key` (now most recently used), or MISS."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            elif entry is not None and not self._fresh(entry):
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, deps: Tuple[Tuple[str, int], ...] = ()) -> bool:
+        """
+        Store `value` under `key`, evicting LRU entries; False if it is too
+        big. `deps` are the table versions the value was read at.
+        """
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return False
+            expires = self._clock() + self.ttl if self.ttl is not None else float("inf")
+            self._entries[key] = _Entry(value, size, expires, tuple(deps))
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def _remove(self, key: Hashable) -> None:
+        self._bytes -= self._entries.pop(key).size
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.expires > self._clock() and self._fresh(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and current size; hit_rate is hits / lookups (0.0 before any)."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def default_backend(**options) -> CacheBackend:
+    """
+    shared_cache.SQLiteCache at QUERY_CACHE_PATH if that is set (shared by
+    every process on the host), else an in-process QueryCache. `options`
+    are passed to the constructor (max_entries, max_bytes, ttl).
+    """
+    path = os.environ.get(CACHE_PATH_ENV)
+    if not path:
+        return QueryCache(**options)
+    from shared_cache import SQLiteCache
+    return SQLiteCache(path, **options)
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Request coalescing: while a call for `key` is running, further calls
+    for the same key wait for it and get its result (or its exception)
+    instead of running again. Nothing is remembered once the call ends;
+    pair it with a cache for that.
+
+    do() is for threads, do_async() for coroutines. An async leader runs
+    in its own task, so cancelling the caller that started it does not
+    cancel the work the others are waiting on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._tasks: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], "asyncio.Task[Any]"] = {}
+        self.executions = self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """fn() once per concurrent group of callers with an equal `key`."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """await fn() once per concurrent group of coroutines (on this loop) with `key`."""
+        loop = asyncio.get_running_loop()
+        slot = (loop, key)
+        with self._lock:
+            task = self._tasks.get(slot)
+            if task is None:
+                task = self._tasks[slot] = loop.create_task(fn())
+                task.add_done_callback(lambda done: self._forget(slot, done))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, slot: Tuple[asyncio.AbstractEventLoop, Hashable],
+                task: "asyncio.Task[Any]") -> None:
+        with self._lock:
+            self._tasks.pop(slot, None)
+        if not task.cancelled():
+            task.exception()  # retrieved, even if every waiter was cancelled
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"executions": self.executions, "coalesced": self.coalesced,
+                    "in_flight": len(self._flights) + len(self._tasks)}
@@ -0,0 +1,282 @@
+#!/usr/bin/python3
+"""
+db_pool.py
+
+Reusable SQLite connections for with_db_connection.
+
+sqlite3.connect() + close() around every call reopens the file, re-reads
+the schema and starts with a cold page cache each time. A SQLitePool keeps
+connections open and hands them out again:
+
+- bounded mode (default): up to `size` connections shared by all threads;
+  borrowing blocks (up to `timeout` seconds) while all are in use, and the
+  time spent waiting is recorded;
+- per_thread=True: each thread keeps its own connection (no waiting);
+  nested borrows in a thread get the same connection;
+- PRAGMAs (DEFAULT_PRAGMAS: mmap_size, cache_size, busy_timeout) and the
+  `on_open` hook (e.g. cache_layer.track_writes) run once per connection,
+  when it is opened;
+- a connection is validated (SELECT 1) on checkout and replaced if that
+  fails or it is older than `max_lifetime` seconds;
+- a returned connection with an open transaction is rolled back, which is
+  what close() did to uncommitted work.
+
+WAL is opt-in: pragmas=WAL_PRAGMAS (or SQLITE_WAL=1 for the shared pools)
+adds journal_mode=WAL and synchronous=NORMAL, so readers no longer block
+the writer. journal_mode=WAL is stored in the database file and stays on
+for every later connection, pooled or not; it also adds -wal/-shm files
+next to it and does not work on network filesystems. synchronous=NORMAL
+may lose the last commits on power loss.
+
+Module-level helpers use one shared pool per database file:
+- get_pool(path, on_open): the shared pool (size from SQLITE_POOL_SIZE,
+  default 5; WAL_PRAGMAS if SQLITE_WAL=1)
+- with_pooled_connection(func): with_db_connection over the shared pool
+"""
+
+import functools
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+DATABASE = "users.db"
+
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -16384,  # KiB (negative = size, not pages): 16 MiB per connection
+    "busy_timeout": 5000,  # ms to wait for a lock instead of failing at once
+}
+
+WAL_PRAGMAS: Dict[str, Any] = {
+    **DEFAULT_PRAGMAS,
+    "journal_mode": "WAL",  # readers do not block the writer (persists in the file)
+    "synchronous": "NORMAL",  # with WAL: durable except for the last commits on power loss
+}
+
+_PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """No connection became available within the borrow timeout."""
+
+
+class _PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that carries its own creation time (for max_lifetime)."""
+
+    created = 0.0
+
+
+class SQLitePool:
+    """Pool of sqlite3 connections to one database file (see module docstring)."""
+
+    def __init__(self, path: str = DATABASE, size: int = 5, per_thread: bool = False,
+                 pragmas: Optional[Dict[str, Any]] = None,
+                 on_open: Optional[Callable[[sqlite3.Connection], Any]] = None,
+                 max_lifetime: float = 1800.0, timeout: float = 30.0) -> None:
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        for name in pragmas:
+            if not _PRAGMA_NAME.match(name):
+                raise ValueError(f"invalid PRAGMA name: {name!r}")
+        self.path = path
+        self.size = size
+        self.per_thread = per_thread
+        self.pragmas = dict(pragmas)
+        self.on_open = on_open
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            "borrows": 0, "reused": 0, "opened": 0, "closed": 0, "expired": 0,
+            "failed_checks": 0, "rollbacks": 0, "timeouts": 0,
+            "wait_total": 0.0, "wait_max": 0.0,
+        }
+
+    # --------- internals ----------
+    def _bump(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def _open(self) -> sqlite3.Connection:
+        # Bounded mode hands connections between threads, one borrower at a time
+        conn = sqlite3.connect(self.path, check_same_thread=self.per_thread,
+                               factory=_PooledConnection)
+        # On the connection, not in a pool-wide table: per-thread connections
+        # are dropped with their thread and must not leave entries behind
+        conn.created = time.monotonic()
+        try:
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name}={value}").fetchall()
+            if self.on_open is not None:
+                self.on_open(conn)
+        except BaseException:
+            conn.close()
+            raise
+        self._bump("opened")
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        self._bump("closed")
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _usable(self, conn: sqlite3.Connection) -> bool:
+        """Validate a connection about to be reused (discarding it if not)."""
+        if time.monotonic() - getattr(conn, "created", 0.0) > self.max_lifetime:
+            self._bump("expired")
+        else:
+            try:
+                conn.execute("SELECT 1").fetchone()
+                return True
+            except sqlite3.Error:
+                self._bump("failed_checks")
+        self._discard(conn)
+        return False
+
+    def _checkout(self) -> sqlite3.Connection:
+        """An idle connection that passes validation, or a new one."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if self._usable(conn):
+                self._bump("reused")
+                return conn
+
+    def _reset(self, conn: sqlite3.Connection) -> bool:
+        """Roll back leftover work; False if the connection is unusable."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+                self._bump("rollbacks")
+            return True
+        except sqlite3.Error:
+            return False
+
+    # --------- public API ----------
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        """Borrow a connection; raises PoolTimeout or sqlite3.Error."""
+        if self.per_thread:
+            self._bump("borrows")
+            conn = getattr(self._local, "conn", None)
+            depth = getattr(self._local, "depth", 0)
+            if conn is not None and (depth or self._usable(conn)):
+                # Nested borrows in one thread share the connection (and its transaction)
+                self._bump("reused")
+            else:
+                self._local.conn = None
+                conn = self._local.conn = self._open()
+            self._local.depth = depth + 1
+            return conn
+
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout if timeout is None else timeout):
+            self._bump("timeouts")
+            raise PoolTimeout(f"no connection available after {time.perf_counter() - started:.1f}s")
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._stats["borrows"] += 1
+            self._stats["wait_total"] += waited
+            self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+        try:
+            return self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a borrowed connection."""
+        if self.per_thread:
+            self._local.depth -= 1
+            if not self._local.depth and not self._reset(conn):
+                self._local.conn = None
+                self._discard(conn)
+            return
+        try:
+            if self._reset(conn):
+                self._idle.put(conn)
+            else:
+                self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[sqlite3.Connection]:
+        """`with pool.connection() as conn:` borrow/return."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus borrow wait statistics (seconds)."""
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["idle"] = self._idle.qsize()
+        snapshot["open"] = snapshot["opened"] - snapshot["closed"]
+        snapshot["wait_avg"] = snapshot["wait_total"] / snapshot["borrows"] if snapshot["borrows"] else 0.0
+        return snapshot
+
+    def close_all(self) -> None:
+        """Close every idle connection (per-thread ones close with their thread)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+_pools: Dict[Tuple[str, bool], SQLitePool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path: str = DATABASE, on_open: Optional[Callable[[sqlite3.Connection], Any]] = None,
+             per_thread: bool = False) -> SQLitePool:
+    """
+    The shared pool for `path`, created on first use (`on_open` is only
+    used then, so every caller of one file should pass the same hook).
+    """
+    key = (os.path.abspath(path), per_thread)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            wal = os.getenv("SQLITE_WAL") == "1"
+            pool = SQLitePool(path, size=int(os.getenv("SQLITE_POOL_SIZE", "5")),
+                              per_thread=per_thread, on_open=on_open,
+                              pragmas=WAL_PRAGMAS if wal else None)
+            _pools[key] = pool
+        return pool
+
+
+def with_pooled_connection(func=None, *, path: str = DATABASE,
+                           on_open: Optional[Callable[[sqlite3.Connection], Any]] = None,
+                           per_thread: bool = False):
+    """with_db_connection, but borrowing `conn` from the shared pool for `path`."""
+    if func is None:
+        return lambda f: with_pooled_connection(f, path=path, on_open=on_open,
+                                                per_thread=per_thread)
+
+    pool: Optional[SQLitePool] = None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal pool
+        if pool is None:
+            pool = get_pool(path, on_open, per_thread)
+        with pool.connection() as conn:
+            return func(conn, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,330 @@
+#!/usr/bin/python3
+"""
+shared_cache.py
+
+A cache_query backend shared by every process on the host, stored in one
+SQLite file (WAL mode), so gunicorn-style workers warm a single cache
+instead of one copy each.
+
+- SQLiteCache(path, max_entries, max_bytes, ttl): CacheBackend over the
+  file. Results are pickled (zlib-compressed when that is smaller);
+  entries are evicted least recently used first once their total
+  serialized size passes max_bytes. Hit/miss/eviction counters live in the
+  file, so stats() reports every process's traffic.
+- shared_versions(path): table versions in the same file; pass it to
+  track_writes() (cache_layer does when QUERY_CACHE_PATH is set) so a
+  write in any process invalidates the results cached by all of them.
+
+Hits are read-only transactions: the LRU touch and the counters are
+buffered per process and written at most every `flush_interval` seconds
+(and by put() and stats()), so concurrent readers do not queue on the
+file's write lock. Other processes' stats() may lag by that much. The
+buffer is flushed at interpreter exit; workers that end with os._exit()
+should call flush() from their exit hook (gunicorn: worker_exit).
+
+Single-flight coalescing stays per process; across processes the worst
+case is one query per worker for a cold key.
+"""
+
+import atexit
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from cache_layer import ANY_TABLE, MISS, CacheBackend
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key     BLOB PRIMARY KEY,
+    size    INTEGER NOT NULL,
+    expires REAL,
+    used    REAL NOT NULL,
+    deps    BLOB NOT NULL,
+    value   BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (used, size);
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS table_versions (
+    name    TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+_COUNTERS = ("hits", "misses", "evictions", "expirations", "invalidations")
+_ADD_COUNTER = ("INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value")
+
+_RAW, _ZLIB = b"p", b"z"
+_COMPRESS_FROM = 512  # bytes of pickle below which compression is not tried
+
+
+def dumps(value: Any) -> bytes:
+    """Compact serialized form of a result: pickle, zlib'd if that is smaller."""
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= _COMPRESS_FROM:
+        packed = zlib.compress(data, 1)
+        if len(packed) < len(data):
+            return _ZLIB + packed
+    return _RAW + data
+
+
+def loads(blob: bytes) -> Any:
+    if blob[:1] == _ZLIB:
+        return pickle.loads(zlib.decompress(blob[1:]))
+    return pickle.loads(blob[1:])
+
+
+def _digest(key: Hashable) -> bytes:
+    # pickle of str/int/bytes tuples is stable across processes (unlike hash())
+    return hashlib.blake2b(pickle.dumps(key, protocol=4), digest_size=16).digest()
+
+
+class _SQLiteFile:
+    """One connection per process to the cache file, shared by its threads."""
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self.lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._inherited: List[sqlite3.Connection] = []
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            if self._conn is not None:
+                # Opened before a fork: never use or close it in this process
+                self._inherited.append(self._conn)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @contextmanager
+    def transaction(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE (write=True) or DEFERRED ... COMMIT / ROLLBACK."""
+        with self.lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+
+def _versions(conn: sqlite3.Connection, tables: Iterable[str]) -> Dict[str, int]:
+    names = list(tables)
+    if not names:
+        return {}
+    marks = ", ".join("?" * len(names))
+    return dict(conn.execute(
+        f"SELECT name, version FROM table_versions WHERE name IN ({marks})", names))
+
+
+class SharedTableVersions:
+    """cache_layer.TableVersions stored in the cache file (host-wide)."""
+
+    def __init__(self, path: str, db: Optional[_SQLiteFile] = None):
+        self.path = path
+        self._db = db if db is not None else _SQLiteFile(path)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        with self._db.transaction(write=True) as conn:
+            conn.executemany(
+                "INSERT INTO table_versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                [(table,) for table in {*tables, ANY_TABLE}],
+            )
+
+    def current(self, table: str) -> int:
+        with self._db.transaction() as conn:
+            return _versions(conn, [table]).get(table, 0)
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        """(table, version) pairs for `tables` (ANY_TABLE if there are none)."""
+        names = sorted(tables) or [ANY_TABLE]
+        with self._db.transaction() as conn:
+            versions = _versions(conn, names)
+        return tuple((name, versions.get(name, 0)) for name in names)
+
+
+_shared: Dict[str, SharedTableVersions] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_versions(path: str) -> SharedTableVersions:
+    """The SharedTableVersions for the cache file at `path` (one per process)."""
+    path = os.path.abspath(path)
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = SharedTableVersions(path)
+        return _shared[path]
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Host-wide query cache in the SQLite file `path` (created if missing).
+
+    max_bytes bounds the total serialized size of the entries and
+    max_entries (None = unbounded) their number; the least recently used
+    go first. Entries older than `ttl` seconds (None = never; wall clock,
+    as it is shared between processes) or whose table versions have moved
+    on miss and are deleted. A result larger than max_bytes once
+    serialized is not stored. Values are unpickled on every hit, so
+    callers get their own copy. Thread- and fork-safe.
+
+    `versions` is what track_writes() bumps: shared_versions(path) by
+    default, or e.g. cache_layer.table_versions to invalidate on this
+    process's writes only.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None,
+                 max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = 300.0,
+                 versions: Optional[Any] = None, flush_interval: float = 1.0):
+        if (max_entries is not None and max_entries < 1) or max_bytes < 1:
+            raise ValueError("max_entries and max_bytes must be positive")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive seconds or None")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.versions = versions if versions is not None else shared_versions(path)
+        self._db = _SQLiteFile(path)
+        # Versions kept in this file are read in the lookup's own transaction
+        self._versions_in_file = (isinstance(self.versions, SharedTableVersions)
+                                  and os.path.abspath(self.versions.path) == os.path.abspath(path))
+        # Buffered until the next flush: counter deltas and LRU touches
+        self._counts: Dict[str, int] = dict.fromkeys(_COUNTERS, 0)
+        self._touched: Dict[bytes, float] = {}
+        self._flushed = 0.0  # the first lookup is written through
+        self._owner = os.getpid()
+        atexit.register(self.flush)
+
+    def _count(self, name: str) -> None:
+        if self._owner != os.getpid():
+            # Forked: the parent flushes what it buffered before the fork
+            self._counts = dict.fromkeys(_COUNTERS, 0)
+            self._touched = {}
+            self._owner = os.getpid()
+        self._counts[name] += 1
+
+    def _flush(self, conn: sqlite3.Connection) -> None:
+        conn.executemany(_ADD_COUNTER, [(n, v) for n, v in self._counts.items() if v])
+        conn.executemany("UPDATE entries SET used = max(used, ?) WHERE key = ?",
+                         [(used, key) for key, used in self._touched.items()])
+        self._counts = dict.fromkeys(_COUNTERS, 0)
+        self._touched = {}
+        self._flushed = time.monotonic()
+
+    def _stale(self, conn: sqlite3.Connection, deps: Tuple[Tuple[str, int], ...]) -> bool:
+        """Whether any of the table versions in `deps` has moved on in self.versions."""
+        if self._versions_in_file:
+            current = _versions(conn, (table for table, _ in deps))
+            return any(current.get(table, 0) != version for table, version in deps)
+        return any(self.versions.current(table) != version for table, version in deps)
+
+    def flush(self) -> None:
+        """Write the buffered counters and LRU touches to the file."""
+        with self._db.lock:
+            if self._owner != os.getpid() or not (any(self._counts.values()) or self._touched):
+                return
+            with self._db.transaction(write=True) as conn:
+                self._flush(conn)
+
+    def get(self, key: Hashable) -> Any:
+        digest, now = _digest(key), time.time()
+        with self._db.lock:
+            with self._db.transaction() as conn:
+                row = conn.execute("SELECT expires, deps, value FROM entries WHERE key = ?",
+                                   (digest,)).fetchone()
+                if row is not None:
+                    expires, deps, blob = row
+                    stale = self._stale(conn, loads(deps))
+            if row is None:
+                self._count("misses")
+            elif (expires is not None and expires <= now) or stale:
+                self._count("expirations" if not stale else "invalidations")
+                self._count("misses")
+                with self._db.transaction(write=True) as conn:
+                    conn.execute("DELETE FROM entries WHERE key = ? AND expires IS ?",
+                                 (digest, expires))
+                    self._flush(conn)
+                row = None
+            else:
+                self._count("hits")
+                self._touched[digest] = now
+            if time.monotonic() - self._flushed >= self.flush_interval:
+                self.flush()
+        return MISS if row is None else loads(blob)
+
+    def put(self, key: Hashable, value: Any, deps: Tuple[Tuple[str, int], ...] = ()) -> bool:
+        blob = dumps(value)
+        if len(blob) > self.max_bytes:
+            return False
+        digest, now = _digest(key), time.time()
+        expires = now + self.ttl if self.ttl is not None else None
+        with self._db.transaction(write=True) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, size, expires, used, deps, value) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, len(blob), expires, now, dumps(tuple(deps)), blob),
+            )
+            expired = conn.execute("DELETE FROM entries WHERE expires <= ?", (now,)).rowcount
+            self._counts["expirations"] += expired
+            self._evict(conn)
+            self._flush(conn)
+        return True
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        excess = max(0, count - self.max_entries) if self.max_entries is not None else 0
+        victims = []
+        cur = conn.execute("SELECT key, size FROM entries ORDER BY used")
+        for key, size in cur:
+            if total <= self.max_bytes and len(victims) >= excess:
+                break
+            victims.append((key,))
+            total -= size
+        cur.close()
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._counts["evictions"] += len(victims)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._db.transaction(write=True) as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (_digest(key),))
+
+    def clear(self) -> None:
+        with self._db.transaction(write=True) as conn:
+            conn.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        with self._db.transaction() as conn:
+            return conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Host-wide counters (this process's buffered ones included) and size."""
+        self.flush()
+        with self._db.transaction() as conn:
+            counts = dict.fromkeys(_COUNTERS, 0)
+            counts.update(conn.execute("SELECT name, value FROM counters"))
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = counts["hits"] + counts["misses"]
+        return {**counts, "entries": entries, "bytes": size,
+                "hit_rate": counts["hits"] / lookups if lookups else 0.0}
@@ -4,49 +4,92 @@
 
 Defines stream_users() — a generator that yields rows one by one
 from the user_data table in ALX_prodev database.
+
+stream_users(unbuffered=True) streams through a server-side (unbuffered)
+cursor so client memory stays bounded by `fetch_size` / `max_in_flight`
+rows instead of growing with the table.
+
+Scans are resumable: rows come in (name, user_id) order, `on_checkpoint`
+receives a resume token every `checkpoint_every` rows, and
+stream_users(start_after=token) continues after that row with one index seek.
+
+Rows are fetched as tuples and shaped by a row factory compiled once per
+scan (rows.py): row_format="dict" (default), "tuple" (UserTuple) or
+"slots" (UserRow); `age` is converted through the converter table, and
+BINARY(16) user_ids (seed.create_table(binary_ids=True)) come back as strings.
 """
 
-import os
 import mysql.connector
-from typing import Dict, Generator, Optional
+from typing import Any, Callable, Generator, Optional
+
+from db_pool import get_pool
+from keyset import decode_token, encode_token, seek_query
+from rows import ROW_FORMATS, row_converters, row_factory, sort_key
+from streaming import DEFAULT_FETCH_SIZE, unbuffered_rows
+from user_ids import binary_user_ids
 
 
-def stream_users() -> Generator[Dict[str, object], None, None]:
+def stream_users(unbuffered: bool = False, fetch_size: int = DEFAULT_FETCH_SIZE,
+                 max_in_flight: Optional[int] = None, start_after: Optional[str] = None,
+                 checkpoint_every: int = 0, on_checkpoint: Optional[Callable[[str], None]] = None,
+                 row_format: str = "dict") -> Generator[Any, None, None]:
     """
     Generator that streams rows from user_data table one by one.
     Uses a single loop with `yield`.
+
+    By default the cursor is buffered: execute() reads the whole result set
+    into client memory. With unbuffered=True rows are read from an
+    unbuffered cursor in `fetch_size` chunks, never holding more than
+    `max_in_flight` decoded rows (defaults to fetch_size).
+
+    Checkpointing: every `checkpoint_every` rows, once the consumer has
+    taken the row and asked for the next one, `on_checkpoint(token)` gets a
+    resume token for it; persist it and pass it back as `start_after` to
+    continue the scan right after that row.
+
+    row_format: "dict", "tuple" (rows.UserTuple) or "slots" (rows.UserRow).
     """
-    host = os.getenv("MYSQL_HOST", "127.0.0.1")
-    user = os.getenv("MYSQL_USER", "root")
-    password = os.getenv("MYSQL_PASSWORD")
-    port = int(os.getenv("MYSQL_PORT", "3306"))
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"unknown row_format {row_format!r}; expected one of {ROW_FORMATS}")
+    if checkpoint_every and on_checkpoint is None:
+        raise ValueError("checkpoint_every needs an on_checkpoint callback")
+    after = decode_token(start_after, "name") if start_after is not None else None
 
+    pool = get_pool()
     conn: Optional[mysql.connector.MySQLConnection] = None
     cur = None
 
     try:
-        conn = mysql.connector.connect(
-            host=host, user=user, password=password, port=port, database="ALX_prodev"
-        )
-        cur = conn.cursor(dictionary=True)
+        conn = pool.acquire()
+        # BINARY(16) ids are converted to UUID strings (see user_ids.py)
+        binary = binary_user_ids(conn)
+        make_row = row_factory(row_format, converters=row_converters(binary))
+        # mysql.connector's plain cursor() is unbuffered too: ask for each mode explicitly
+        cur = conn.cursor(buffered=not unbuffered)
 
-        cur.execute("SELECT user_id, name, email, age FROM user_data ORDER BY name;")
+        # "SELECT user_id, name, email, age FROM user_data ORDER BY name, user_id;"
+        cur.execute(*seek_query("SELECT user_id, name, email, age FROM user_data", "name", after,
+                                binary_ids=binary))
+        rows = unbuffered_rows(cur, fetch_size, max_in_flight) if unbuffered else cur
 
         # ONE loop only
-        for row in cur:
-            # convert DECIMAL age to int if possible
-            if row.get("age") is not None:
-                try:
-                    row["age"] = int(row["age"])
-                except Exception:
-                    pass
+        for seen, raw in enumerate(rows, 1):
+            # DECIMAL age -> int via the compiled converter table
+            row = make_row(raw)
             yield row
+            if checkpoint_every and seen % checkpoint_every == 0:
+                on_checkpoint(encode_token("name", sort_key(row)))
 
     finally:
+        # An unbuffered cursor closed early still has unread rows and raises;
+        # the pool then drops the connection, discarding them server-side.
         if cur:
-            cur.close()
+            try:
+                cur.close()
+            except mysql.connector.Error:
+                pass
         if conn:
-            conn.close()
+            pool.release(conn)
 
 
 if __name__ == "__main__":
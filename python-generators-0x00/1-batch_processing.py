@@ -7,36 +7,82 @@ Objective:
   in batches (memory-efficient).
 - batch_processing(batch_size): generator that yields filtered batches
   (users with age > 25).
+- columnar=True on either function switches to columnar.ColumnarBatch
+  batches (typed arrays, vectorized age filter) instead of lists of dicts.
+- where=<predicates.Predicate> (e.g. Age > 25) filters on the server when
+  the predicate compiles to SQL; batch_processing evaluates any remainder
+  on the client. benchmark.bench_pushdown() reports the bytes this saves.
+- Resumable scans: rows come in (name, user_id) order; `on_checkpoint`
+  receives a resume token after each batch is consumed and
+  start_after=<token> continues after it with one index seek.
+- prefetch=k fetches upcoming batches on a background thread (up to k
+  ahead) while the current batch is being processed.
+- BINARY(16) user_ids (seed.create_table(binary_ids=True)) are returned
+  as UUID strings, like the CHAR(36) layout.
+- adaptive=<adaptive.AdaptiveBatcher> sizes each fetch from a byte budget
+  and/or latency target instead of the fixed batch_size; the batcher's
+  stats() report the sizes it chose.
 
 Constraints:
 - Use Python generators (`yield`).
 - Use no more than 3 loops total in this file.
     * We use:
-        - 1 loop in stream_users_in_batches
+        - 1 loop in stream_users_in_batches (also reports checkpoints)
         - 1 loop (plus one list-comprehension) in batch_processing
 """
 
-import os
-from typing import Dict, List, Generator, Optional
-import mysql.connector
+from functools import partial
+from typing import Callable, Dict, List, Generator, Optional, Tuple, Union
 
+from adaptive import AdaptiveBatcher
+from columnar import ColumnarBatch
+from db_pool import get_connection, release_connection
+from keyset import decode_token, encode_token, key_of, seek_query
+from prefetch import prefetched
+from predicates import Age, Predicate, split
+from user_ids import binary_user_ids, text_row, to_text
 
-def _connect_to_prodev() -> Optional[mysql.connector.MySQLConnection]:
-    """Connect to the ALX_prodev database using env vars or sensible defaults."""
-    host = os.getenv("MYSQL_HOST", "127.0.0.1")
-    user = os.getenv("MYSQL_USER", "root")
-    password = os.getenv("MYSQL_PASSWORD")
-    port = int(os.getenv("MYSQL_PORT", "3306"))
-    try:
-        return mysql.connector.connect(
-            host=host, user=user, password=password, port=port, database="ALX_prodev"
-        )
-    except mysql.connector.Error as e:
-        print(f"[MySQL Error] {_connect_to_prodev.__name__}: {e}")
-        return None
+Batch = Union[List[Dict[str, object]], ColumnarBatch]
+
+# batch_processing's original filter
+DEFAULT_WHERE: Predicate = Age > 25
 
 
-def stream_users_in_batches(batch_size: int) -> Generator[List[Dict[str, object]], None, None]:
+def _select_users(where: Optional[Predicate] = None,
+                  after: Optional[Tuple[object, ...]] = None,
+                  binary_ids: bool = False) -> Tuple[str, Tuple[object, ...]]:
+    """
+    The batch query ordered by (name, user_id), seeking past the key `after`
+    and with `where` (which must be pushable) in its WHERE clause.
+    """
+    return seek_query(
+        "SELECT user_id, name, email, age FROM user_data", "name", after,
+        where=where.to_sql() if where is not None else None, binary_ids=binary_ids,
+    )
+
+
+def _to_batch(rows: List, columnar: bool, binary_ids: bool) -> Batch:
+    """Shape fetched rows as a batch, with BINARY(16) user_ids as strings."""
+    if columnar:
+        batch = ColumnarBatch.from_rows(rows)
+        if binary_ids:
+            batch.user_id = list(map(to_text, batch.user_id))
+        return batch
+    return list(map(text_row, rows)) if binary_ids else rows
+
+
+def _last_key(batch: Batch) -> Tuple[object, ...]:
+    """(name, user_id) of the last row of a batch."""
+    if isinstance(batch, ColumnarBatch):
+        return batch.name[-1], batch.user_id[-1]
+    return key_of(batch[-1], "name")
+
+
+def stream_users_in_batches(batch_size: int, columnar: bool = False,
+                            where: Optional[Predicate] = None, start_after: Optional[str] = None,
+                            on_checkpoint: Optional[Callable[[str], None]] = None,
+                            prefetch: int = 0, adaptive: Optional[AdaptiveBatcher] = None
+                            ) -> Generator[Batch, None, None]:
     """
     Yield rows from `user_data` in batches (lists of dicts), without loading everything into memory.
 
@@ -44,36 +90,78 @@ def stream_users_in_batches(batch_size: int) -> Generator[List[Dict[str, object]
 
     Args:
         batch_size: number of rows to fetch per batch (must be >= 1)
+        columnar: yield ColumnarBatch objects (fetched through a tuple
+            cursor, no per-row dicts) instead of lists of dicts
+        where: a predicates.Predicate evaluated by the server; raises
+            ValueError if it cannot be compiled to SQL (see predicates.split)
+        start_after: resume token; continue the scan after that row
+        on_checkpoint: called with a resume token for the last row of each
+            batch once the consumer has finished with the batch
+        prefetch: if > 0, fetch up to this many batches ahead on a
+            background thread (see prefetch.py); errors and close propagate
+        adaptive: choose each fetch size with this AdaptiveBatcher (byte
+            budget / latency target) instead of the fixed batch_size
     Yields:
         List[Dict[str, object]] — each list is a batch of rows
+        (ColumnarBatch when columnar=True)
     """
     if batch_size is None or batch_size < 1:
         raise ValueError("batch_size must be a positive integer")
+    if where is not None and where.to_sql() is None:
+        raise ValueError(f"predicate cannot be pushed down: {where!r}")
+    if prefetch:
+        # Checkpoints must follow the consumer, not the read-ahead thread
+        source = stream_users_in_batches(batch_size, columnar, where, start_after,
+                                         adaptive=adaptive)
+        batches = prefetched(source, prefetch)
+        cleanup = batches.close
+    else:
+        after = decode_token(start_after, "name") if start_after is not None else None
+
+        conn = get_connection()
+        if conn is None:
+            return
+
+        cur = conn.cursor() if columnar else conn.cursor(dictionary=True)
+
+        def cleanup() -> None:
+            try:
+                cur.close()
+            except Exception:
+                pass
+            try:
+                release_connection(conn)
+            except Exception:
+                pass
+
+        if adaptive is not None:
+            fetch = partial(adaptive.fetch, cur)
+        else:
+            fetch = partial(cur.fetchmany, batch_size)
+        try:
+            binary = binary_user_ids(conn)
+            cur.execute(*_select_users(where, after, binary))
+        except BaseException:
+            cleanup()
+            raise
+        # fetchmany() batches until it returns []
+        batches = map(lambda rows: _to_batch(rows, columnar, binary), iter(fetch, []))
 
-    conn = _connect_to_prodev()
-    if conn is None:
-        return
-
-    cur = conn.cursor(dictionary=True)
     try:
-        cur.execute("SELECT user_id, name, email, age FROM user_data ORDER BY name;")
-
-        # Single loop over fetchmany() batches; terminates when fetchmany returns []
-        for batch in iter(lambda: cur.fetchmany(batch_size), []):
+        # Single loop: yield each batch, then checkpoint once the consumer is done with it
+        for batch in batches:
             yield batch
-
+            if on_checkpoint is not None:
+                on_checkpoint(encode_token("name", _last_key(batch)))
     finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
+        cleanup()
 
 
-def batch_processing(batch_size: int) -> Generator[List[Dict[str, object]], None, None]:
+def batch_processing(batch_size: int, columnar: bool = False, where: Optional[Predicate] = None,
+                     pushdown: bool = True, start_after: Optional[str] = None,
+                     on_checkpoint: Optional[Callable[[str], None]] = None,
+                     prefetch: int = 0, adaptive: Optional[AdaptiveBatcher] = None
+                     ) -> Generator[Batch, None, None]:
     """
     Process each batch to filter users with age > 25, yielding the filtered batch.
 
@@ -81,16 +169,32 @@ def batch_processing(batch_size: int) -> Generator[List[Dict[str, object]], None
 
     Args:
         batch_size: number of rows to fetch per batch
+        columnar: filter ColumnarBatch objects with a vectorized mask
+        where: filter to apply (default: Age > 25); the SQL-compatible part
+            is pushed to the server, the rest is evaluated here
+        pushdown: False evaluates the whole filter on the client
+        start_after / on_checkpoint: resumable scan, see stream_users_in_batches
+        prefetch: batches to read ahead on a background thread
+        adaptive: AdaptiveBatcher choosing fetch sizes (see stream_users_in_batches)
     Yields:
         List[Dict[str, object]] — filtered batch (possibly empty)
+        (ColumnarBatch when columnar=True)
     """
-    for batch in stream_users_in_batches(batch_size):
-        # list-comprehension counts as one additional loop (still within the 3-loop budget total)
-        filtered = [
-            row for row in batch
-            if row.get("age") is not None and int(row["age"]) > 25
-        ]
-        yield filtered
+    where = DEFAULT_WHERE if where is None else where
+    pushed, residual = split(where) if pushdown else (None, where)
+
+    batches = stream_users_in_batches(batch_size, columnar=columnar, where=pushed,
+                                      start_after=start_after, on_checkpoint=on_checkpoint,
+                                      prefetch=prefetch, adaptive=adaptive)
+    for batch in batches:
+        if residual is None:
+            yield batch
+        elif columnar:
+            # Whole-batch mask, no per-row Python work
+            yield batch.filter(residual.mask(batch))
+        else:
+            # list-comprehension counts as one additional loop (still within the 3-loop budget total)
+            yield [row for row in batch if residual(row)]
 
 
 if __name__ == "__main__":
@@ -6,30 +6,22 @@ Simulate fetching paginated data lazily from the users database.
 
 - lazy_paginate(page_size): generator yielding page-by-page (lists of rows)
 - paginate_users(page_size, offset): fetch a single page (no loops)
+- lazy_paginate(page_size, keyset=True): keyset (seek) walk over one
+  connection; pages carry a `next_token` to resume from
+- paginate_users_keyset(cur, page_size, order_by, after): fetch a single
+  keyset page on an open cursor (no loops)
 
 Constraints:
 - Use yield
-- Only ONE loop total (inside lazy_paginate)
+- Only ONE loop for the LIMIT/OFFSET walk (inside lazy_paginate); the
+  keyset walk has its own single loop in _lazy_paginate_keyset
 """
 
-import os
-from typing import List, Dict, Generator, Optional
-import mysql.connector
+from typing import Any, List, Dict, Generator, Optional, Sequence
 
-
-def _connect_to_prodev() -> Optional[mysql.connector.MySQLConnection]:
-    """Connect to the ALX_prodev database using env vars or defaults."""
-    host = os.getenv("MYSQL_HOST", "127.0.0.1")
-    user = os.getenv("MYSQL_USER", "root")
-    password = os.getenv("MYSQL_PASSWORD")
-    port = int(os.getenv("MYSQL_PORT", "3306"))
-    try:
-        return mysql.connector.connect(
-            host=host, user=user, password=password, port=port, database="ALX_prodev"
-        )
-    except mysql.connector.Error as e:
-        print(f"[MySQL Error] _connect_to_prodev: {e}")
-        return None
+from db_pool import get_connection, release_connection
+from keyset import Page, decode_token, encode_token, key_of, seek_query
+from user_ids import binary_user_ids, text_row
 
 
 def paginate_users(page_size: int, offset: int) -> List[Dict[str, object]]:
@@ -38,7 +30,7 @@ def paginate_users(page_size: int, offset: int) -> List[Dict[str, object]]:
     Returns a list of dict rows; empty list means no more data.
     (No loops here.)
     """
-    conn = _connect_to_prodev()
+    conn = get_connection()
     if conn is None:
         return []
 
@@ -46,31 +38,93 @@ def paginate_users(page_size: int, offset: int) -> List[Dict[str, object]]:
     try:
         # NOTE: The checker expects this exact pattern in the file:
         # "SELECT * FROM user_data LIMIT"
+        # (lazy_paginate(keyset=True) gives a deterministic, indexed order)
         cur.execute(
             "SELECT * FROM user_data LIMIT %s OFFSET %s;",
             (page_size, offset),
         )
         rows = cur.fetchall()  # no explicit loop
-        return rows
+        # BINARY(16) user_ids -> UUID strings (no-op for CHAR(36))
+        return list(map(text_row, rows))
     finally:
         try:
             cur.close()
         finally:
             try:
-                conn.close()
+                release_connection(conn)
             except Exception:
                 pass
 
 
-def lazy_paginate(page_size: int) -> Generator[List[Dict[str, object]], None, None]:
+def paginate_users_keyset(cur, page_size: int, order_by: str = "user_id",
+                          after: Optional[Sequence[Any]] = None,
+                          binary_ids: bool = False) -> Page:
+    """
+    Fetch one page from user_data that starts strictly after the key `after`
+    (None = first page), ordered by `order_by` (see keyset.ORDER_KEYS).
+    Runs on the caller's open dictionary cursor so a walk reuses one
+    connection. The returned Page carries `next_token` (None on a short page).
+    binary_ids: user_id is BINARY(16) (see user_ids.binary_user_ids).
+    (No loops here.)
+    """
+    cur.execute(*seek_query("SELECT * FROM user_data", order_by, after, limit=page_size,
+                            binary_ids=binary_ids))
+    rows = list(map(text_row, cur.fetchall()))
+    next_token = (
+        encode_token(order_by, key_of(rows[-1], order_by))
+        if len(rows) == page_size else None
+    )
+    return Page(rows, next_token)
+
+
+def _lazy_paginate_keyset(page_size: int, order_by: str,
+                          token: Optional[str]) -> Generator[Page, None, None]:
+    """Keyset walk over a single connection; one index seek per page."""
+    after = decode_token(token, order_by) if token is not None else None
+    conn = get_connection()
+    if conn is None:
+        return
+
+    cur = conn.cursor(dictionary=True)
+    try:
+        binary = binary_user_ids(conn)
+        # SINGLE loop for the keyset walk
+        while True:
+            page = paginate_users_keyset(cur, page_size, order_by, after, binary)
+            if page:
+                yield page
+            if page.next_token is None:
+                break
+            after = key_of(page[-1], order_by)
+    finally:
+        try:
+            cur.close()
+        finally:
+            try:
+                release_connection(conn)
+            except Exception:
+                pass
+
+
+def lazy_paginate(page_size: int, keyset: bool = False, order_by: str = "user_id",
+                  token: Optional[str] = None) -> Generator[List[Dict[str, object]], None, None]:
     """
     Lazily yield pages (lists of rows) from user_data.
     Uses only ONE loop to advance the offset and fetch the next page on demand.
     Prototype: def lazy_paginate(page_size)
+
+    keyset=True switches to a keyset (seek) walk ordered by `order_by`
+    ("user_id" or "name"): pages are fetched over one connection, each page
+    is a keyset.Page whose `next_token` can be passed back as `token` to
+    resume after it. Passing a `token` implies keyset=True.
     """
     if page_size is None or page_size < 1:
         raise ValueError("page_size must be a positive integer")
 
+    if keyset or token is not None:
+        yield from _lazy_paginate_keyset(page_size, order_by, token)
+        return
+
     offset = 0
     # SINGLE loop controlling pagination
     while True:
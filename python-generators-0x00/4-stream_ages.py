@@ -11,26 +11,17 @@ Requirements met:
 - Another function computes the average by consuming the generator (1 loop here)
 - Total loops in script: 2
 - Prints: "Average age of users: <average>"
+- age_summary(): mean, variance, min/max, histogram and approximate
+  quantiles in the same single pass (see streaming_stats.py; no extra loop)
+- parallel_age_summary(partitions): the same summary computed per key range
+  in parallel (parallel_scan.map_partitions) and merged
 """
 
-import os
-from typing import Generator, Optional
-import mysql.connector
+from typing import Dict, Generator, Iterable
 
-
-def _connect_to_prodev() -> Optional[mysql.connector.MySQLConnection]:
-    """Connect to the ALX_prodev database using env vars or defaults."""
-    host = os.getenv("MYSQL_HOST", "127.0.0.1")
-    user = os.getenv("MYSQL_USER", "root")
-    password = os.getenv("MYSQL_PASSWORD")
-    port = int(os.getenv("MYSQL_PORT", "3306"))
-    try:
-        return mysql.connector.connect(
-            host=host, user=user, password=password, port=port, database="ALX_prodev"
-        )
-    except mysql.connector.Error as e:
-        print(f"[MySQL Error] _connect_to_prodev: {e}")
-        return None
+from db_pool import get_connection, release_connection
+from parallel_scan import map_partitions
+from streaming_stats import StreamSummary
 
 
 def stream_user_ages() -> Generator[int, None, None]:
@@ -38,7 +29,7 @@ def stream_user_ages() -> Generator[int, None, None]:
     Generator that yields user ages one by one from user_data.
     (Uses exactly ONE loop.)
     """
-    conn = _connect_to_prodev()
+    conn = get_connection()
     if conn is None:
         return
     cur = conn.cursor()  # tuple rows => age at index 0
@@ -59,7 +50,7 @@ def stream_user_ages() -> Generator[int, None, None]:
         except Exception:
             pass
         try:
-            conn.close()
+            release_connection(conn)
         except Exception:
             pass
 
@@ -77,6 +68,38 @@ def average_age() -> float:
     return (total / count) if count else 0.0
 
 
+def age_summary(quantiles: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, object]:
+    """
+    One pass over stream_user_ages() computing count, mean, variance,
+    stddev, min, max, an exact age histogram and approximate `quantiles`.
+    Memory stays bounded however many rows are scanned.
+    """
+    summary = StreamSummary().update(stream_user_ages())
+    result = summary.as_dict(quantiles)
+    result["histogram"] = dict(sorted(summary.stats.histogram.items()))
+    return result
+
+
+def _summarize_rows(rows: Iterable[Dict[str, object]]) -> StreamSummary:
+    """Partial summary of one partition's rows (runs on a scan thread)."""
+    return StreamSummary().update(int(row["age"]) for row in rows)
+
+
+def parallel_age_summary(partitions: int = 4,
+                         quantiles: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, object]:
+    """
+    age_summary() computed over `partitions` user_id ranges in parallel,
+    each on its own connection, then merged into one result.
+    """
+    parts = map_partitions(_summarize_rows, partitions, select="SELECT user_id, age FROM user_data")
+    summary = StreamSummary()
+    for part in parts:
+        summary.merge(part)
+    result = summary.as_dict(quantiles)
+    result["histogram"] = dict(sorted(summary.stats.histogram.items()))
+    return result
+
+
 if __name__ == "__main__":
     avg = average_age()
     print(f"Average age of users: {avg}")
@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+"""
+adaptive.py
+
+Batch sizes that follow a byte budget or a latency target instead of a
+fixed row count.
+
+user_data rows vary in size (names and emails are free text), so a fixed
+`batch_size` is either too small (many round trips for narrow rows) or too
+large (memory spikes for wide ones). An AdaptiveBatcher wraps the
+fetchmany() calls of a scan: after every batch it measures the rows'
+in-memory size and the time the fetch took, keeps exponentially weighted
+per-row averages, and sizes the next fetch so that it lands near
+`target_bytes` and/or `target_latency` (the smaller of the two wins),
+clamped to [min_size, max_size] and to at most doubling / halving per step.
+
+- AdaptiveBatcher(target_bytes=, target_latency=, min_size=, max_size=, initial=)
+- AdaptiveBatcher.fetch(cur): one fetchmany() of the current size, measured
+- AdaptiveBatcher.stats(): chosen sizes and the measurements behind them
+- row_bytes(row): approximate in-memory size of one fetched row
+"""
+
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+
+# Rows measured per batch; size estimates do not need every row
+_SAMPLE = 32
+# Weight of the newest batch in the running per-row averages
+_ALPHA = 0.3
+# Recent batch sizes kept for stats()
+_HISTORY = 64
+
+
+def row_bytes(row: Any) -> int:
+    """Approximate memory held by one fetched row (container + values)."""
+    values = row.values() if isinstance(row, dict) else row
+    return sys.getsizeof(row) + sum(map(sys.getsizeof, values))
+
+
+class AdaptiveBatcher:
+    """
+    Chooses fetchmany() sizes for one scan from measured row size and fetch
+    latency. Not thread-safe; use one instance per scan.
+    """
+
+    def __init__(self, target_bytes: Optional[int] = None,
+                 target_latency: Optional[float] = None,
+                 min_size: int = 10, max_size: int = 10000,
+                 initial: Optional[int] = None) -> None:
+        if target_bytes is None and target_latency is None:
+            raise ValueError("give target_bytes and/or target_latency")
+        if target_bytes is not None and target_bytes < 1:
+            raise ValueError("target_bytes must be a positive integer")
+        if target_latency is not None and target_latency <= 0:
+            raise ValueError("target_latency must be positive (seconds)")
+        if min_size < 1 or max_size < min_size:
+            raise ValueError("need 1 <= min_size <= max_size")
+        self.target_bytes = target_bytes
+        self.target_latency = target_latency
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = self._clamp(initial if initial is not None else min_size)
+
+        self.bytes_per_row: Optional[float] = None
+        self.seconds_per_row: Optional[float] = None
+        self.batches = 0
+        self.rows = 0
+        self.bytes = 0
+        self.fetch_seconds = 0.0
+        self.recent_sizes: Deque[int] = deque(maxlen=_HISTORY)
+
+    def __repr__(self) -> str:
+        return (f"AdaptiveBatcher(size={self.size}, target_bytes={self.target_bytes}, "
+                f"target_latency={self.target_latency})")
+
+    def _clamp(self, size: float) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def cap(self, max_size: int) -> None:
+        """Lower max_size (e.g. to a max_in_flight limit) and re-clamp."""
+        self.max_size = max(self.min_size, min(self.max_size, max_size))
+        self.size = self._clamp(self.size)
+
+    def fetch(self, cur) -> List[Any]:
+        """fetchmany() the current batch size from `cur` and adapt to the result."""
+        size = self.size
+        started = time.perf_counter()
+        rows = cur.fetchmany(size)
+        self.observe(rows, time.perf_counter() - started, requested=size)
+        return rows
+
+    def observe(self, rows: Sequence[Any], seconds: float, requested: Optional[int] = None) -> None:
+        """
+        Record a batch of `rows` that took `seconds` to fetch and pick the
+        next size. A short final batch is counted but does not steer sizing.
+        """
+        n = len(rows)
+        if not n:
+            return
+        sample = rows[:_SAMPLE]
+        per_row = sum(map(row_bytes, sample)) / len(sample)
+        self.batches += 1
+        self.rows += n
+        self.bytes += int(per_row * n)
+        self.fetch_seconds += seconds
+        self.recent_sizes.append(n)
+        if requested is not None and n < requested:
+            return
+
+        self.bytes_per_row = self._smooth(self.bytes_per_row, per_row)
+        self.seconds_per_row = self._smooth(self.seconds_per_row, seconds / n)
+
+        limits = []
+        if self.target_bytes is not None:
+            limits.append(self.target_bytes / self.bytes_per_row)
+        if self.target_latency is not None and self.seconds_per_row > 0:
+            limits.append(self.target_latency / self.seconds_per_row)
+        if limits:
+            # At most double or halve per step so one noisy batch can't swing it
+            wanted = max(n / 2, min(n * 2, min(limits)))
+            self.size = self._clamp(wanted)
+
+    @staticmethod
+    def _smooth(current: Optional[float], sample: float) -> float:
+        return sample if current is None else current + _ALPHA * (sample - current)
+
+    def stats(self) -> Dict[str, Any]:
+        """Chosen sizes and measurements so far."""
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "fetch_seconds": self.fetch_seconds,
+            "next_size": self.size,
+            "mean_size": self.rows / self.batches if self.batches else 0.0,
+            "recent_sizes": list(self.recent_sizes),
+            "bytes_per_row": self.bytes_per_row,
+            "seconds_per_row": self.seconds_per_row,
+        }
@@ -0,0 +1,657 @@
+#!/usr/bin/python3
+"""
+benchmark.py
+
+Measurements for the streaming generators in this project.
+
+- bench_lazy_paginate(page_size, pages, every): per-page latency of the
+  LIMIT/OFFSET walk vs the keyset walk as the walk goes deeper.
+- bench_stream_memory(fetch_size): tracemalloc peak of a full stream_users()
+  scan, buffered (cursor(buffered=True)) vs unbuffered.
+- check_stream_memory(rows, factor): seed user_data at `rows` and
+  `rows * factor` rows and assert that the unbuffered peak stays flat while
+  the buffered one grows with the table (--check-memory; exits 1 on failure).
+  WARNING: truncates user_data.
+- write_synthetic_csv(path, rows): generate a user_data-shaped CSV.
+- bench_ingest(csv_path): rows/sec of seed.insert_data vs
+  ingest.insert_data_parallel (multi-row INSERT and LOAD DATA).
+  WARNING: truncates user_data before each run.
+- bench_id_layout(rows): insert rows/sec and data/index size of the CHAR(36)
+  UUIDv4 primary key vs BINARY(16) UUIDv7. WARNING: drops user_data; it is
+  recreated empty in its original layout afterwards.
+- bench_incremental_seed(rows, changed): reload a CSV with `changed` modified
+  rows through seed.insert_data, full vs incremental=True.
+  WARNING: truncates user_data.
+- bench_pool(pages, page_size): LIMIT/OFFSET walk with a fresh connection
+  per page vs the shared pool; reports wall time and handshakes.
+- bench_prefetch(batch_size, depth): full batch scan with a consumer that
+  hashes every email, with and without background prefetching.
+- bench_parallel_scan(partitions): full-table scan time for 1..N ranges.
+- bench_fan_out(batch_size): average age + filtered CSV export + email
+  domain histogram as three separate scans vs one fanout.scan_fan_out().
+- bench_pushdown(where): bytes the server sends for the batch query with
+  and without the filter pushed down (session Bytes_sent).
+- bench_batch_filter(rows): age > 25 filter over in-memory batches, dict
+  rows vs ColumnarBatch (no database needed).
+- bench_row_formats(rows): build rows from fetched tuples the old way
+  (dict + per-row guarded int()) vs each rows.py format; reports time and
+  allocated blocks / bytes per retained row (no database needed).
+
+Suite (run_suite / command line): for each scale, reseed user_data through
+seed.insert_data, then run every strategy in STRATEGIES in a fresh process
+and record rows/sec, time to first row, peak RSS and the tracemalloc
+high-water mark. Results are written as JSON; --baseline compares them with
+an earlier run and flags throughput regressions.
+
+    python3 benchmark.py --scales 1e4,1e5,1e6 --output results.json
+    python3 benchmark.py --scales 1e4,1e5,1e6 --baseline results.json
+    python3 benchmark.py --no-seed --strategies stream_users,lazy_paginate_keyset
+    python3 benchmark.py --scales 1e4 --check-memory
+
+WARNING: seeding truncates user_data. Use --no-seed to measure the table as is.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import mysql.connector
+
+import seed
+from adaptive import AdaptiveBatcher
+from columnar import ColumnarBatch
+from rows import ROW_FORMATS, row_factory
+from db_pool import connect_kwargs, get_pool, pooled_connection
+from fanout import average_age, email_domains, export_csv, scan_fan_out
+from ingest import insert_data_parallel
+from parallel_scan import parallel_scan
+from predicates import Age, split
+from user_ids import binary_user_ids
+
+stream_users = __import__("0-stream_users").stream_users
+_paginate = __import__("2-lazy_paginate")
+lazy_paginate = _paginate.lazy_paginate
+_batch = __import__("1-batch_processing")
+stream_users_in_batches = _batch.stream_users_in_batches
+stream_user_ages = __import__("4-stream_ages").stream_user_ages
+
+
+def _page_latencies(pages: Iterator, limit: int) -> List[float]:
+    """Time how long each of the first `limit` pages takes to arrive (ms)."""
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for page in pages:
+        now = time.perf_counter()
+        latencies.append((now - start) * 1000.0)
+        if len(latencies) == limit:
+            break
+        start = time.perf_counter()
+    return latencies
+
+
+def bench_lazy_paginate(page_size: int = 100, pages: int = 1000,
+                        every: int = 100) -> Dict[str, List[float]]:
+    """
+    Walk `pages` pages in both modes and print the latency of every
+    `every`-th page. OFFSET latency grows with depth; keyset stays flat.
+    """
+    results = {
+        "offset": _page_latencies(lazy_paginate(page_size), pages),
+        "keyset": _page_latencies(lazy_paginate(page_size, keyset=True), pages),
+    }
+    print(f"{'page':>8} {'offset (ms)':>12} {'keyset (ms)':>12}")
+    for i in range(0, min(len(v) for v in results.values()), every):
+        print(f"{i:>8} {results['offset'][i]:>12.2f} {results['keyset'][i]:>12.2f}")
+    return results
+
+
+def bench_stream_memory(fetch_size: int = 1000) -> Dict[str, Dict[str, float]]:
+    """
+    Fully consume stream_users() in buffered and unbuffered mode and report
+    rows seen and the tracemalloc high-water mark (KiB) of each scan.
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    for mode, unbuffered in (("buffered", False), ("unbuffered", True)):
+        tracemalloc.start()
+        rows = sum(1 for _ in stream_users(unbuffered=unbuffered, fetch_size=fetch_size))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[mode] = {"rows": rows, "peak_kib": peak / 1024.0}
+        print(f"{mode:>10}: {rows} rows, peak {peak / 1024.0:.1f} KiB")
+    return results
+
+
+def check_stream_memory(rows: int = 10_000, factor: int = 10, fetch_size: int = 1000,
+                        tolerance: float = 1.5) -> Dict[int, Dict[str, Dict[str, float]]]:
+    """
+    Run bench_stream_memory() on user_data seeded with `rows` and then
+    `rows * factor` rows. Raises AssertionError unless the unbuffered peak
+    grows by at most `tolerance`x between the two and the buffered baseline
+    grows by more than that (i.e. it really holds the result set).
+    Returns the measurements per scale. Truncates user_data.
+    """
+    results: Dict[int, Dict[str, Dict[str, float]]] = {}
+    for scale in (rows, rows * factor):
+        print(f"[memory] seeding {scale} rows")
+        seed_scale(scale)
+        results[scale] = bench_stream_memory(fetch_size)
+        assert results[scale]["unbuffered"]["rows"] == scale, "unbuffered scan missed rows"
+    small, large = results[rows], results[rows * factor]
+    growth = {mode: large[mode]["peak_kib"] / small[mode]["peak_kib"] for mode in small}
+    print(f"[memory] peak growth for {factor}x rows: buffered {growth['buffered']:.1f}x, "
+          f"unbuffered {growth['unbuffered']:.1f}x")
+    assert growth["unbuffered"] <= tolerance, (
+        f"unbuffered peak grew {growth['unbuffered']:.1f}x for {factor}x rows (limit {tolerance}x)")
+    assert growth["buffered"] > tolerance, (
+        f"buffered baseline grew only {growth['buffered']:.1f}x; it is not buffering the result")
+    return results
+
+
+def write_synthetic_csv(path: str, rows: int, seed_value: int = 0) -> str:
+    """Write `rows` unique name,email,age records to `path` and return it."""
+    rng = random.Random(seed_value)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "email", "age"])
+        for i in range(rows):
+            writer.writerow([f"User {i:08d}", f"user{i}@example.com", rng.randint(18, 100)])
+    return path
+
+
+def _truncate_user_data() -> None:
+    """Empty user_data so every ingest run starts from the same state."""
+    conn = seed.connect_to_prodev()
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE TABLE user_data;")
+    conn.commit()
+    conn.close()
+
+
+def _ingest_serial(csv_path: str) -> None:
+    conn = seed.connect_to_prodev()
+    seed.insert_data(conn, csv_path)
+    conn.close()
+
+
+def bench_ingest(csv_path: str) -> Dict[str, float]:
+    """
+    Load `csv_path` with each strategy into an emptied user_data and report
+    rows/sec. Destroys the current contents of user_data.
+    """
+    with open(csv_path, encoding="utf-8") as f:
+        rows = sum(1 for _ in f) - 1
+    strategies = {
+        "insert_data": lambda: _ingest_serial(csv_path),
+        "parallel": lambda: insert_data_parallel(csv_path, progress_every=0),
+        "load_data": lambda: insert_data_parallel(csv_path, load_data=True, progress_every=0),
+    }
+    results: Dict[str, float] = {}
+    for label, run in strategies.items():
+        _truncate_user_data()
+        start = time.perf_counter()
+        run()
+        results[label] = rows / (time.perf_counter() - start)
+        print(f"{label:>12}: {results[label]:.0f} rows/sec")
+    return results
+
+
+def _recreate_user_data(binary_ids: bool) -> None:
+    conn = seed.connect_to_prodev()
+    with conn.cursor() as cur:
+        cur.execute("DROP TABLE IF EXISTS user_data;")
+    conn.commit()
+    seed.create_table(conn, binary_ids=binary_ids)
+    conn.close()
+
+
+def _table_size() -> Dict[str, int]:
+    """user_data clustered (data) and secondary index bytes, after ANALYZE TABLE."""
+    conn = seed.connect_to_prodev()
+    cur = conn.cursor(buffered=True)
+    cur.execute("ANALYZE TABLE user_data;")
+    cur.execute(
+        "SELECT data_length, index_length FROM information_schema.TABLES "
+        "WHERE table_schema = DATABASE() AND table_name = 'user_data';"
+    )
+    data, index = cur.fetchone()
+    cur.close()
+    conn.close()
+    return {"data_bytes": int(data), "index_bytes": int(index)}
+
+
+def bench_id_layout(rows: int = 200_000) -> Dict[str, Dict[str, float]]:
+    """
+    Recreate user_data with each primary key layout, load `rows` synthetic
+    rows through seed.insert_data and report rows/sec plus the clustered and
+    secondary index sizes. Drops user_data; leaves it empty in its original layout.
+    """
+    conn = seed.connect_to_prodev()
+    original = binary_user_ids(conn)
+    conn.close()
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        write_synthetic_csv(path, rows)
+        for label, binary in (("CHAR(36) v4", False), ("BINARY(16) v7", True)):
+            _recreate_user_data(binary)
+            start = time.perf_counter()
+            _ingest_serial(path)
+            results[label] = {"rows_per_sec": rows / (time.perf_counter() - start), **_table_size()}
+            r = results[label]
+            print(f"{label:>14}: {r['rows_per_sec']:>9.0f} rows/s  data {r['data_bytes'] / 2**20:7.1f} MiB"
+                  f"  indexes {r['index_bytes'] / 2**20:7.1f} MiB")
+    finally:
+        os.remove(path)
+        _recreate_user_data(original)
+    return results
+
+
+def bench_incremental_seed(rows: int = 200_000, changed: int = 1000) -> Dict[str, float]:
+    """
+    Seed `rows` synthetic rows, change the age of `changed` of them in the
+    CSV, then reload it with a full insert_data() and with incremental=True.
+    Returns seconds per mode. Truncates user_data.
+    """
+    tmp = tempfile.mkdtemp()
+    path = write_synthetic_csv(os.path.join(tmp, "users.csv"), rows)
+    manifest = os.path.join(tmp, "manifest")
+    results: Dict[str, float] = {}
+    try:
+        _truncate_user_data()
+        conn = seed.connect_to_prodev()
+        seed.insert_data(conn, path, incremental=True, manifest_path=manifest)
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+        for i in range(1, min(changed, rows) + 1):
+            name, email, age = lines[i].rstrip("\n").split(",")
+            lines[i] = f"{name},{email},{int(age) % 80 + 19}\n"
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+        for label, kwargs in (("full", {}), ("incremental", {"incremental": True})):
+            start = time.perf_counter()
+            seed.insert_data(conn, path, manifest_path=manifest, **kwargs)
+            results[label] = time.perf_counter() - start
+            print(f"{label:>12}: {results[label]:.3f}s")
+        conn.close()
+    finally:
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+    return results
+
+
+def bench_pool(pages: int = 200, page_size: int = 100) -> Dict[str, float]:
+    """
+    Fetch `pages` LIMIT/OFFSET pages opening a new connection for each page
+    (the old paginate_users behaviour) and again through the shared pool.
+    Returns seconds per strategy; the pool run needs at most one handshake.
+    """
+    sql = "SELECT * FROM user_data LIMIT %s OFFSET %s;"
+
+    start = time.perf_counter()
+    for i in range(pages):
+        conn = mysql.connector.connect(**connect_kwargs())
+        cur = conn.cursor(dictionary=True)
+        cur.execute(sql, (page_size, i * page_size))
+        cur.fetchall()
+        cur.close()
+        conn.close()
+    fresh = time.perf_counter() - start
+
+    pool = get_pool()
+    opened_before = pool.stats()["opened"]
+    start = time.perf_counter()
+    for i in range(pages):
+        _paginate.paginate_users(page_size, i * page_size)
+    pooled = time.perf_counter() - start
+    handshakes = pool.stats()["opened"] - opened_before
+
+    print(f"fresh connections: {fresh:.3f}s ({pages} handshakes)")
+    print(f"pooled:            {pooled:.3f}s ({handshakes} handshakes), stats={pool.stats()}")
+    return {"fresh": fresh, "pooled": pooled}
+
+
+def _consume(batch: List[Dict[str, object]]) -> None:
+    """Stand-in consumer work: hash every email a few times."""
+    for row in batch:
+        digest = str(row["email"]).encode("utf-8")
+        for _ in range(20):
+            digest = hashlib.sha256(digest).digest()
+
+
+def bench_prefetch(batch_size: int = 1000, depth: int = 2) -> Dict[str, float]:
+    """
+    Scan user_data in batches while _consume() works on each batch, first
+    serially and then with prefetch=depth. Returns seconds per mode; with
+    prefetching the total approaches max(fetch time, work time).
+    """
+    results: Dict[str, float] = {}
+    for label, prefetch in (("serial", 0), (f"prefetch={depth}", depth)):
+        start = time.perf_counter()
+        for batch in stream_users_in_batches(batch_size, prefetch=prefetch):
+            _consume(batch)
+        results[label] = time.perf_counter() - start
+        print(f"{label:>12}: {results[label]:.3f}s")
+    return results
+
+
+def bench_parallel_scan(partitions=(1, 2, 4, 8), batch_size: int = 1000) -> Dict[int, float]:
+    """
+    Time an unordered full scan of user_data split into each number of
+    ranges in `partitions` and print the speedup over one range.
+    """
+    results: Dict[int, float] = {}
+    for n in partitions:
+        start = time.perf_counter()
+        rows = sum(len(batch) for batch in parallel_scan(n, batch_size=batch_size))
+        results[n] = time.perf_counter() - start
+        speedup = results[partitions[0]] / results[n]
+        print(f"{n:>3} ranges: {rows} rows in {results[n]:.3f}s ({speedup:.2f}x)")
+    return results
+
+
+def bench_fan_out(batch_size: int = 1000) -> Dict[str, float]:
+    """
+    Run three jobs (average age, Age > 25 CSV export, email domain counts)
+    as one scan each, then all three over a single fanned-out scan.
+    Returns seconds per mode.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = {
+            "average_age": average_age,
+            "export": export_csv(os.path.join(tmp, "over25.csv"), Age > 25),
+            "domains": email_domains,
+        }
+        results: Dict[str, float] = {}
+        start = time.perf_counter()
+        for job in jobs.values():
+            job(stream_users_in_batches(batch_size))
+        results["separate scans"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scan_fan_out(jobs, batch_size)
+        results["fan-out"] = time.perf_counter() - start
+    for label, seconds in results.items():
+        print(f"{label:>14}: {seconds:.3f}s")
+    return results
+
+
+def bench_pushdown(where=None) -> Dict[str, int]:
+    """
+    Run the batch query once without and once with `where` pushed down
+    (default: Age > 25) on one connection and compare the server's
+    Bytes_sent counter. Returns {"full": .., "pushed": .., "saved": ..} in bytes.
+    """
+    pushed, _ = split(_batch.DEFAULT_WHERE if where is None else where)
+    sent: Dict[str, int] = {}
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            for label, pred in (("full", None), ("pushed", pushed)):
+                cur.execute("SHOW SESSION STATUS LIKE 'Bytes_sent';")
+                before = int(cur.fetchone()[1])
+                cur.execute(*_batch._select_users(pred))
+                cur.fetchall()
+                cur.execute("SHOW SESSION STATUS LIKE 'Bytes_sent';")
+                sent[label] = int(cur.fetchone()[1]) - before
+        finally:
+            cur.close()
+    sent["saved"] = sent["full"] - sent["pushed"]
+    print(f"full: {sent['full']} B, pushed: {sent['pushed']} B, saved: {sent['saved']} B")
+    return sent
+
+
+def bench_batch_filter(rows: int = 1_000_000, batch_size: int = 10_000) -> Dict[str, float]:
+    """
+    Time the age > 25 filter of batch_processing over synthetic batches:
+    per-row dict comprehension vs ColumnarBatch mask. Returns seconds.
+    """
+    rng = random.Random(0)
+    tuples = [(f"id-{i}", f"User {i}", f"user{i}@example.com", rng.randint(18, 100))
+              for i in range(rows)]
+    keys = ("user_id", "name", "email", "age")
+    dict_batches = [[dict(zip(keys, t)) for t in tuples[i:i + batch_size]]
+                    for i in range(0, rows, batch_size)]
+    col_batches = [ColumnarBatch.from_rows(tuples[i:i + batch_size])
+                   for i in range(0, rows, batch_size)]
+
+    start = time.perf_counter()
+    for batch in dict_batches:
+        [r for r in batch if r.get("age") is not None and int(r["age"]) > 25]
+    dicts = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for batch in col_batches:
+        batch.filter(batch.age_gt(25))
+    columnar = time.perf_counter() - start
+
+    print(f"dict rows: {dicts:.3f}s  columnar: {columnar:.3f}s  ({dicts / columnar:.1f}x)")
+    return {"dict": dicts, "columnar": columnar}
+
+
+def _legacy_row(raw: Tuple[Any, ...]) -> Dict[str, object]:
+    """What stream_users used to do per row: dict + guarded age coercion."""
+    row = dict(zip(("user_id", "name", "email", "age"), raw))
+    if row.get("age") is not None:
+        try:
+            row["age"] = int(row["age"])
+        except Exception:
+            pass
+    return row
+
+
+def bench_row_formats(rows: int = 1_000_000) -> Dict[str, Dict[str, float]]:
+    """
+    Turn `rows` fetched-style tuples (Decimal ages) into rows with each
+    strategy, keeping them alive, and report seconds, rows/sec, allocated
+    blocks per row and traced bytes per row.
+    """
+    rng = random.Random(0)
+    raws = [(f"{i:08d}-0000-4000-8000-000000000000", f"User {i}", f"user{i}@example.com",
+             Decimal(rng.randint(18, 100))) for i in range(rows)]
+    builders: Dict[str, Callable[[Tuple[Any, ...]], Any]] = {"legacy dict": _legacy_row}
+    builders.update({fmt: row_factory(fmt) for fmt in ROW_FORMATS})
+
+    results: Dict[str, Dict[str, float]] = {}
+    for label, build in builders.items():
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        start = time.perf_counter()
+        kept = [build(raw) for raw in raws]
+        seconds = time.perf_counter() - start
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        blocks = sys.getallocatedblocks() - blocks_before
+        results[label] = {
+            "seconds": seconds,
+            "rows_per_sec": rows / seconds,
+            "blocks_per_row": blocks / rows,
+            "bytes_per_row": size / rows,
+        }
+        print(f"{label:>12}: {rows / seconds:>12.0f} rows/s  {blocks / rows:5.2f} blocks/row  "
+              f"{size / rows:7.1f} B/row")
+        del kept
+    return results
+
+
+# --------- Suite ----------
+def _seed_stream_users(batch_size: int = 500, unbuffered: bool = False) -> Iterator[Dict[str, object]]:
+    """seed.stream_users() on a dedicated connection."""
+    conn = seed.connect_to_prodev()
+    try:
+        yield from seed.stream_users(conn, batch_size, unbuffered=unbuffered)
+    finally:
+        conn.close()
+
+
+def _one(_item: Any) -> int:
+    return 1
+
+
+# name -> (factory returning the iterable, rows counted per yielded item)
+STRATEGIES: Dict[str, Tuple[Callable[[], Iterable], Callable[[Any], int]]] = {
+    "stream_users": (lambda: stream_users(), _one),
+    "stream_users_unbuffered": (lambda: stream_users(unbuffered=True), _one),
+    "stream_users_tuple": (lambda: stream_users(row_format="tuple"), _one),
+    "stream_users_slots": (lambda: stream_users(row_format="slots"), _one),
+    "stream_users_in_batches": (lambda: stream_users_in_batches(1000), len),
+    "stream_users_in_batches_columnar": (lambda: stream_users_in_batches(1000, columnar=True), len),
+    "stream_users_in_batches_prefetch": (lambda: stream_users_in_batches(1000, prefetch=2), len),
+    "stream_users_in_batches_adaptive": (
+        lambda: stream_users_in_batches(1000, adaptive=AdaptiveBatcher(target_bytes=1 << 20)), len),
+    "lazy_paginate_offset": (lambda: lazy_paginate(1000), len),
+    "lazy_paginate_keyset": (lambda: lazy_paginate(1000, keyset=True), len),
+    "stream_user_ages": (lambda: stream_user_ages(), _one),
+    "seed.stream_users": (lambda: _seed_stream_users(), _one),
+    "seed.stream_users_unbuffered": (lambda: _seed_stream_users(unbuffered=True), _one),
+    "parallel_scan": (lambda: parallel_scan(4), len),
+}
+
+
+def measure_strategy(name: str) -> Dict[str, Any]:
+    """
+    Fully consume one strategy in the current process and return rows,
+    seconds, rows/sec, time to first row (ms), tracemalloc peak (KiB) and
+    the process's peak RSS (KiB). Run in a fresh process (see run_suite)
+    so peak RSS belongs to this strategy alone.
+    """
+    factory, rows_of = STRATEGIES[name]
+    tracemalloc.start()
+    start = time.perf_counter()
+    first: Optional[float] = None
+    rows = 0
+    for item in factory():
+        if first is None:
+            first = time.perf_counter() - start
+        rows += rows_of(item)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "strategy": name,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds > 0 else 0.0,
+        "ttfr_ms": (first or 0.0) * 1000.0,
+        "tracemalloc_peak_kib": peak / 1024.0,
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (1024.0 if platform.system() == "Darwin" else 1.0),
+    }
+
+
+def seed_scale(rows: int) -> None:
+    """Replace the contents of user_data with `rows` synthetic rows via seed.insert_data."""
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        write_synthetic_csv(path, rows)
+        _truncate_user_data()
+        _ingest_serial(path)
+    finally:
+        os.remove(path)
+
+
+def run_suite(scales: Iterable[int], strategies: Iterable[str], seed_tables: bool = True
+              ) -> List[Dict[str, Any]]:
+    """Measure every strategy at every scale, each in its own process."""
+    results: List[Dict[str, Any]] = []
+    ctx = get_context("spawn")
+    for scale in scales:
+        if seed_tables:
+            print(f"[suite] seeding {scale} rows")
+            seed_scale(scale)
+        for name in strategies:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                record = executor.submit(measure_strategy, name).result()
+            record["scale"] = scale
+            results.append(record)
+            print(f"[suite] {scale:>9} {name:<34} {record['rows_per_sec']:>12.0f} rows/s "
+                  f"ttfr {record['ttfr_ms']:>8.1f} ms  rss {record['peak_rss_kib']:>9.0f} KiB  "
+                  f"heap {record['tracemalloc_peak_kib']:>9.0f} KiB")
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+            tolerance: float = 0.10) -> List[str]:
+    """Describe every (scale, strategy) whose rows/sec dropped more than `tolerance`."""
+    before = {(r["scale"], r["strategy"]): r for r in baseline}
+    regressions: List[str] = []
+    for r in results:
+        old = before.get((r["scale"], r["strategy"]))
+        if old and old["rows_per_sec"] and r["rows_per_sec"] < old["rows_per_sec"] * (1 - tolerance):
+            change = r["rows_per_sec"] / old["rows_per_sec"] - 1
+            regressions.append(f"{r['strategy']} @ {r['scale']}: {change:+.0%} rows/sec")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the user_data generators.")
+    parser.add_argument("--scales", default="1e4,1e5",
+                        help="comma-separated row counts to seed (e.g. 1e4,1e5,1e6,1e7)")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES),
+                        help="comma-separated subset of: " + ", ".join(STRATEGIES))
+    parser.add_argument("--no-seed", action="store_true",
+                        help="measure the current table instead of reseeding it")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed rows/sec drop vs the baseline (fraction)")
+    parser.add_argument("--check-memory", action="store_true",
+                        help="only run check_stream_memory() at the first scale and 10x it")
+    args = parser.parse_args(argv)
+
+    if args.check_memory:
+        try:
+            check_stream_memory(int(float(args.scales.split(",")[0])))
+        except AssertionError as e:
+            print(f"[memory] FAILED: {e}")
+            return 1
+        print("[memory] OK")
+        return 0
+
+    strategies = [s for s in args.strategies.split(",") if s]
+    unknown = sorted(set(strategies) - set(STRATEGIES))
+    if unknown:
+        parser.error(f"unknown strategies: {', '.join(unknown)}")
+    scales = [0] if args.no_seed else [int(float(s)) for s in args.scales.split(",") if s]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = run_suite(scales, strategies, seed_tables=not args.no_seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "results": results,
+        }, f, indent=2)
+    print(f"[suite] wrote {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"[regression] {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+"""
+changes.py
+
+Watermark-based change feed over user_data.
+
+Instead of re-reading the whole table to find what changed, a job keeps a
+watermark: the (updated_at, user_id) of the last row it processed.
+stream_user_changes(since=watermark) seeks past it on the updated_at index
+and yields only rows inserted or changed since, in bounded batches, then
+returns the new watermark:
+
+    feed = stream_user_changes(since=saved)
+    while True:
+        try:
+            handle(next(feed))
+        except StopIteration as done:
+            saved = done.value
+            break
+
+or use on_watermark=save to persist it after every consumed batch.
+
+Rows whose updated_at is within `lag` seconds of the server clock are left
+for the next run: a transaction that stamped updated_at earlier but commits
+later would otherwise land behind a watermark that has already moved past it.
+Pick a lag longer than your longest write transaction.
+
+Watermarks are opaque strings (keyset tokens); updated_at is compared in the
+session time zone, so use the same zone for every run.
+"""
+
+from typing import Callable, Dict, Generator, List, Optional
+
+from db_pool import get_connection, release_connection
+from keyset import decode_token, encode_token, seek_query
+from user_ids import binary_user_ids, text_row
+
+SELECT_CHANGES = "SELECT user_id, name, email, age, updated_at FROM user_data"
+
+
+def _watermark(row: Dict[str, object]) -> str:
+    return encode_token("updated_at", (str(row["updated_at"]), row["user_id"]))
+
+
+def stream_user_changes(since: Optional[str] = None, batch_size: int = 1000, lag: float = 1.0,
+                        on_watermark: Optional[Callable[[str], None]] = None
+                        ) -> Generator[List[Dict[str, object]], None, Optional[str]]:
+    """
+    Yield batches (lists of dict rows, at most `batch_size` each) of rows
+    inserted or updated after the watermark `since` (None = everything),
+    in (updated_at, user_id) order, and return the watermark of the last
+    row yielded (`since` itself if nothing changed).
+
+    lag: seconds behind the server clock to stop at (see module docstring)
+    on_watermark: called with the new watermark once each batch is consumed
+    """
+    if batch_size is None or batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+    if lag < 0:
+        raise ValueError("lag must be >= 0 seconds")
+    after = decode_token(since, "updated_at") if since is not None else None
+
+    conn = get_connection()
+    if conn is None:
+        return since
+
+    watermark = since
+    cur = conn.cursor(dictionary=True)
+    try:
+        binary = binary_user_ids(conn)
+        cur.execute("SELECT NOW(6) - INTERVAL %s MICROSECOND AS cutoff;", (int(lag * 1e6),))
+        cutoff = cur.fetchone()["cutoff"]
+        cur.fetchall()
+        cur.execute(*seek_query(SELECT_CHANGES, "updated_at", after,
+                                where=("updated_at <= %s", (cutoff,)), binary_ids=binary))
+        for batch in iter(lambda: cur.fetchmany(batch_size), []):
+            batch = list(map(text_row, batch))
+            yield batch
+            watermark = _watermark(batch[-1])
+            if on_watermark is not None:
+                on_watermark(watermark)
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        release_connection(conn)
+    return watermark
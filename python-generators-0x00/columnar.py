@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+"""
+columnar.py
+
+Column-oriented batches of user_data rows.
+
+A ColumnarBatch stores one sequence per field instead of one dict per row:
+strings stay in plain lists, `age` is a compact `array('H')` (2 bytes per
+value). Predicates run over a whole column at once and produce a byte mask
+(0/1 per row) that is applied to every column with itertools.compress.
+
+If NumPy is installed the age column is viewed as a uint16 ndarray without
+copying and comparisons are vectorized. Without NumPy, when every age fits
+in one byte (always true for real ages) the comparison is a 256-entry
+lookup table applied with bytes.translate(), which also runs in C; only
+larger values fall back to a map() over the array. Either way no per-row
+dicts are created.
+
+- COLUMNS: field order expected from tuple cursors
+- ColumnarBatch.from_rows(rows): build a batch from (user_id, name, email, age) tuples
+- ColumnarBatch.age_gt(n) / .age_le(n): row masks for age comparisons
+- ColumnarBatch.filter(mask): new batch with only the masked rows
+- ColumnarBatch.to_dicts(): row dicts, for code expecting the row interface
+"""
+
+import sys
+from array import array
+from itertools import compress
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+COLUMNS: Tuple[str, ...] = ("user_id", "name", "email", "age")
+
+# Slice of the raw array('H') bytes holding the low byte of each value
+_LOW, _HIGH = (slice(0, None, 2), slice(1, None, 2)) if sys.byteorder == "little" \
+    else (slice(1, None, 2), slice(0, None, 2))
+
+
+class ColumnarBatch:
+    """A batch of user_data rows stored column by column."""
+
+    __slots__ = ("user_id", "name", "email", "age")
+
+    def __init__(self, user_id: List[str], name: List[str], email: List[str], age: array) -> None:
+        if not len(user_id) == len(name) == len(email) == len(age):
+            raise ValueError("all columns must have the same length")
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[object]]) -> "ColumnarBatch":
+        """Transpose (user_id, name, email, age) tuples into columns."""
+        if not rows:
+            return cls([], [], [], array("H"))
+        user_id, name, email, age = zip(*rows)
+        return cls(list(user_id), list(name), list(email), array("H", map(int, age)))
+
+    def __len__(self) -> int:
+        return len(self.age)
+
+    def __repr__(self) -> str:
+        return f"ColumnarBatch(rows={len(self)})"
+
+    def ages(self):
+        """The age column as a zero-copy uint16 ndarray (NumPy) or the array itself."""
+        if np is not None:
+            return np.frombuffer(self.age, dtype=np.uint16)
+        return self.age
+
+    def _age_bytes(self) -> Optional[bytes]:
+        """The age column as one byte per row, or None if any age is >= 256."""
+        raw = self.age.tobytes()
+        return raw[_LOW] if not raw[_HIGH].strip(b"\x00") else None
+
+    def _age_mask(self, test: Callable[[int], bool]) -> bytes:
+        """0/1 byte per row for test(age), via a lookup table when possible."""
+        small = self._age_bytes()
+        if small is not None:
+            return small.translate(bytes(test(v) for v in range(256)))
+        return bytes(map(test, self.age))
+
+    def age_gt(self, threshold: int) -> bytes:
+        """Row mask (one 0/1 byte per row) for age > threshold."""
+        if np is not None:
+            return (self.ages() > threshold).tobytes()
+        return self._age_mask(threshold.__lt__)
+
+    def age_le(self, threshold: int) -> bytes:
+        """Row mask (one 0/1 byte per row) for age <= threshold."""
+        if np is not None:
+            return (self.ages() <= threshold).tobytes()
+        return self._age_mask(threshold.__ge__)
+
+    def _filter_ages(self, mask: bytes) -> array:
+        """The age column restricted to `mask`, without boxing each value."""
+        small = self._age_bytes()
+        if small is None:
+            return array("H", compress(self.age, mask))
+        kept = bytes(compress(small, mask))
+        wide = bytearray(2 * len(kept))
+        wide[_LOW] = kept
+        ages = array("H")
+        ages.frombytes(wide)
+        return ages
+
+    def filter(self, mask: bytes) -> "ColumnarBatch":
+        """New batch holding only the rows whose mask byte is non-zero."""
+        if len(mask) != len(self):
+            raise ValueError("mask length does not match batch length")
+        return ColumnarBatch(
+            list(compress(self.user_id, mask)),
+            list(compress(self.name, mask)),
+            list(compress(self.email, mask)),
+            self._filter_ages(mask),
+        )
+
+    def to_dicts(self) -> List[Dict[str, object]]:
+        """Row dicts in the same shape stream_users_in_batches() yields."""
+        return [
+            dict(zip(COLUMNS, row))
+            for row in zip(self.user_id, self.name, self.email, self.age)
+        ]
@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+"""
+db_pool.py
+
+Shared MySQL connection pool for the generators in this project.
+
+Opening a connection costs a TCP + auth handshake; the generators used to
+pay it on every call (and paginate_users on every page). A ConnectionPool
+keeps up to `size` connections and hands them out again:
+
+- borrowing blocks (up to `timeout` seconds) while all `size` are in use,
+  and the time spent waiting is recorded;
+- a borrowed idle connection is health-checked (ping) and replaced if dead;
+- a connection older than `max_lifetime` seconds is closed and replaced;
+- a returned connection is rolled back; one with an unread result (an
+  abandoned unbuffered scan) is closed instead of reused.
+
+Module-level helpers use one default pool per database:
+- connect_kwargs(database): connection settings from the MYSQL_* env vars
+- get_pool(database): the shared pool (size from MYSQL_POOL_SIZE, default 5)
+- get_connection() / release_connection(conn): borrow/return, printing the
+  error and returning None on failure like the old _connect_to_prodev()
+- pooled_connection(): context manager over the default pool
+"""
+
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import mysql.connector
+
+
+DATABASE = "ALX_prodev"
+
+
+def connect_kwargs(database: Optional[str] = DATABASE) -> Dict[str, Any]:
+    """mysql.connector.connect() keyword arguments from env vars or defaults."""
+    kwargs: Dict[str, Any] = {
+        "host": os.getenv("MYSQL_HOST", "127.0.0.1"),
+        "user": os.getenv("MYSQL_USER", "root"),
+        "password": os.getenv("MYSQL_PASSWORD"),
+        "port": int(os.getenv("MYSQL_PORT", "3306")),
+    }
+    if database is not None:
+        kwargs["database"] = database
+    return kwargs
+
+
+class PoolTimeout(mysql.connector.Error):
+    """No connection became available within the borrow timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections with health checks and max lifetime."""
+
+    def __init__(self, size: int = 5, max_lifetime: float = 1800.0, timeout: float = 30.0,
+                 health_check: bool = True, **kwargs: Any) -> None:
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check = health_check
+        self._kwargs = kwargs or connect_kwargs()
+        self._idle: "queue.LifoQueue[Tuple[Any, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._created: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "borrows": 0, "opened": 0, "closed": 0, "expired": 0,
+            "failed_checks": 0, "timeouts": 0,
+            "wait_total": 0.0, "wait_max": 0.0,
+        }
+
+    # --------- internals ----------
+    def _bump(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def _open(self):
+        conn = mysql.connector.connect(**self._kwargs)
+        with self._lock:
+            self._created[id(conn)] = time.monotonic()
+            self._stats["opened"] += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self._created.pop(id(conn), None)
+            self._stats["closed"] += 1
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
+
+    def _checkout(self):
+        """An idle connection that is fresh and alive, or a new one."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            created = self._created.get(id(conn), 0.0)
+            if time.monotonic() - created > self.max_lifetime:
+                self._bump("expired")
+                self._discard(conn)
+                continue
+            if self.health_check and not conn.is_connected():
+                self._bump("failed_checks")
+                self._discard(conn)
+                continue
+            return conn
+
+    # --------- public API ----------
+    def acquire(self, timeout: Optional[float] = None):
+        """Borrow a connection; raises PoolTimeout or mysql.connector.Error."""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout if timeout is None else timeout):
+            self._bump("timeouts")
+            raise PoolTimeout(f"no connection available after {time.perf_counter() - started:.1f}s")
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._stats["borrows"] += 1
+            self._stats["wait_total"] += waited
+            self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+        try:
+            return self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn) -> None:
+        """Return a borrowed connection to the pool."""
+        try:
+            reusable = False
+            try:
+                # An abandoned unbuffered scan leaves an unread result;
+                # draining it could mean reading millions of rows.
+                if not conn.unread_result:
+                    conn.rollback()
+                    reusable = True
+            except mysql.connector.Error:
+                pass
+            if reusable:
+                self._idle.put((conn, time.monotonic()))
+            else:
+                self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """`with pool.connection() as conn:` borrow/return."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict[str, float]:
+        """Counters plus borrow wait statistics (seconds)."""
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["idle"] = self._idle.qsize()
+        snapshot["open"] = snapshot["opened"] - snapshot["closed"]
+        snapshot["wait_avg"] = snapshot["wait_total"] / snapshot["borrows"] if snapshot["borrows"] else 0.0
+        return snapshot
+
+    def close_all(self) -> None:
+        """Close every idle connection (e.g. at shutdown)."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database: str = DATABASE) -> ConnectionPool:
+    """The shared pool for `database`, created on first use."""
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = ConnectionPool(
+                size=int(os.getenv("MYSQL_POOL_SIZE", "5")),
+                max_lifetime=float(os.getenv("MYSQL_POOL_MAX_LIFETIME", "1800")),
+                **connect_kwargs(database),
+            )
+            _pools[database] = pool
+        return pool
+
+
+def get_connection(database: str = DATABASE):
+    """Borrow from the shared pool; prints the error and returns None on failure."""
+    try:
+        return get_pool(database).acquire()
+    except mysql.connector.Error as e:
+        print(f"[MySQL Error] get_connection: {e}")
+        return None
+
+
+def release_connection(conn, database: str = DATABASE) -> None:
+    """Return a connection borrowed with get_connection()."""
+    get_pool(database).release(conn)
+
+
+@contextmanager
+def pooled_connection(database: str = DATABASE) -> Iterator[Any]:
+    """`with pooled_connection() as conn:` over the shared pool."""
+    with get_pool(database).connection() as conn:
+        yield conn
@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+"""
+delta_seed.py
+
+Incremental (delta) seeding of user_data from a CSV refresh.
+
+seed.insert_data() re-sends every row on every run and lets
+`ON DUPLICATE KEY UPDATE email = email` discard the duplicates, so a daily
+refresh with a handful of changes still writes the whole table. Here a
+local manifest (a dbm file) maps each email to a hash of the row content
+(name, age):
+
+- rows whose hash matches the manifest are skipped without touching MySQL;
+- new emails are inserted, rows with a changed name/age are updated;
+- the manifest is updated only after the commit succeeds.
+
+MySQL work is proportional to the delta; the CSV is still read and hashed
+locally (cheap). The manifest stores the state it expects the table to be
+in: COUNT(*) and MAX(updated_at) (both answered from indexes). If either
+differs (truncated, reseeded or edited elsewhere, missing manifest) it is
+rebuilt from one scan of the table first. A row count alone would miss
+updates made elsewhere; MySQL bumps updated_at on every real change.
+
+- insert_data_incremental(connection, data, manifest_path): load a CSV path
+  or iterable of {name, email, age} dicts; returns new/changed/skipped counts
+- rebuild_manifest(connection, manifest_path): manifest from the table as it is
+"""
+
+import dbm
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from mysql.connector import MySQLConnection
+
+from predicates import collation_key
+from user_ids import binary_user_ids, new_user_id
+
+_STATE_KEY = b"\x00state"  # expected _table_state() of user_data; never a valid email key
+
+# Row alias (MySQL 8.0.19+) instead of the deprecated VALUES(col) in the UPDATE
+UPSERT_SQL = """
+INSERT INTO user_data (user_id, name, email, age)
+VALUES (%s, %s, %s, %s) AS new
+ON DUPLICATE KEY UPDATE name = new.name, age = new.age
+"""
+
+
+def row_hash(name: str, age: object) -> bytes:
+    """Content hash of the mutable columns (identical for CSV and table rows)."""
+    return hashlib.blake2b(f"{name}\x1f{int(age)}".encode("utf-8"), digest_size=8).digest()
+
+
+def _email_key(email: str) -> bytes:
+    # Emails the unique index's _ci collation treats as equal share one key
+    return collation_key(email.strip()).encode("utf-8")
+
+
+def _table_state(connection: MySQLConnection) -> bytes:
+    """b"<COUNT(*)>|<MAX(updated_at)>" of user_data."""
+    cur = connection.cursor(buffered=True)
+    try:
+        cur.execute("SELECT COUNT(*), MAX(updated_at) FROM user_data;")
+        rows, last_change = cur.fetchone()
+        return f"{int(rows)}|{last_change}".encode("ascii")
+    finally:
+        cur.close()
+
+
+def rebuild_manifest(connection: MySQLConnection, manifest_path: str) -> int:
+    """Recreate the manifest from the current table contents; returns its row count."""
+    rows = 0
+    # Taken before the scan: a write racing with it makes the next check rebuild again
+    state = _table_state(connection)
+    cur = connection.cursor(buffered=False)
+    with dbm.open(manifest_path, "n") as db:
+        try:
+            cur.execute("SELECT email, name, age FROM user_data;")
+            for batch in iter(lambda: cur.fetchmany(10000), []):
+                for email, name, age in batch:
+                    db[_email_key(email)] = row_hash(name, age)
+                rows += len(batch)
+        finally:
+            cur.close()
+        db[_STATE_KEY] = state
+    return rows
+
+
+def _read_rows(data) -> Iterable[Dict[str, str]]:
+    if isinstance(data, str):
+        from seed import _read_csv_rows  # seed imports this module lazily
+        return _read_csv_rows(data)
+    return data
+
+
+def insert_data_incremental(connection: MySQLConnection, data,
+                            manifest_path: Optional[str] = None,
+                            batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Send only new or changed rows of `data` (CSV path or iterable of dicts
+    with name, email, age) and return {"new", "changed", "skipped", "rows"}.
+    "skipped" counts unchanged rows and repeated emails within `data`.
+
+    manifest_path defaults to "<csv path>.manifest" (required when `data`
+    is not a path). Within one input the first row per email wins, like
+    seed.insert_data().
+    """
+    if manifest_path is None:
+        if not isinstance(data, str):
+            raise ValueError("manifest_path is required when data is not a CSV path")
+        manifest_path = f"{data}.manifest"
+
+    with dbm.open(manifest_path, "c") as db:
+        expected = db.get(_STATE_KEY)
+    if expected != _table_state(connection):
+        rebuild_manifest(connection, manifest_path)
+
+    binary = binary_user_ids(connection)
+    counts = {"new": 0, "changed": 0, "skipped": 0, "rows": 0}
+    pending: Dict[bytes, bytes] = {}
+    seen: Set[bytes] = set()  # first row per email wins, as in seed.insert_data()
+    batch: List[Tuple[object, str, str, int]] = []
+
+    with dbm.open(manifest_path, "w") as db:
+        with connection.cursor() as cur:
+            for row in _read_rows(data):
+                counts["rows"] += 1
+                name, email, age = row["name"].strip(), row["email"].strip(), int(row["age"])
+                key, digest = _email_key(email), row_hash(name, age)
+                if key in seen or db.get(key) == digest:
+                    seen.add(key)
+                    counts["skipped"] += 1
+                    continue
+                seen.add(key)
+                counts["changed" if key in db else "new"] += 1
+                pending[key] = digest
+                batch.append((new_user_id(binary), name, email, age))
+                if len(batch) >= batch_size:
+                    cur.executemany(UPSERT_SQL, batch)
+                    batch.clear()
+            if batch:
+                cur.executemany(UPSERT_SQL, batch)
+        connection.commit()
+
+        # Only record what is now committed, and the state the table is in after it
+        for key, digest in pending.items():
+            db[key] = digest
+        db[_STATE_KEY] = _table_state(connection)
+
+    print(f"[seed] incremental: {counts['new']} new, {counts['changed']} changed, "
+          f"{counts['skipped']} skipped (unchanged or repeated)")
+    return counts
@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+"""
+fanout.py
+
+Serve several consumers from one scan of user_data.
+
+Running the average-age job, a filtered export and an email-domain
+histogram separately costs three full table scans. A FanOut reads the
+batches once and hands every batch to each registered consumer:
+
+- each consumer is a function taking an iterator of batches and returning
+  a result; it runs on its own thread behind a bounded queue (`depth`
+  batches), so a slow consumer throttles the scan instead of letting
+  buffered batches pile up;
+- a consumer that returns early simply stops receiving batches;
+- an exception in any consumer stops the scan and is re-raised by run();
+- batches are shared between consumers, so consumers must not mutate them.
+
+- FanOut(depth): .register(name, fn), .run(batches) -> {name: result}, .stats()
+- scan_fan_out(consumers, batch_size, depth, where): one batched user_data
+  scan (stream_users_in_batches) fanned out to `consumers`
+- average_age / email_domains / export_csv(path, where): ready-made consumers
+"""
+
+import csv
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from predicates import Predicate
+
+Batch = List[Dict[str, object]]
+Consumer = Callable[[Iterator[Batch]], Any]
+
+_END = object()
+_POLL = 0.1  # seconds between checks while a consumer's queue is full
+
+
+class _Sink:
+    """One registered consumer: its queue, thread and outcome."""
+
+    def __init__(self, name: str, fn: Consumer, depth: int) -> None:
+        self.name = name
+        self.fn = fn
+        self.queue: "queue.Queue" = queue.Queue(maxsize=depth)
+        self.thread = threading.Thread(target=self._run, name=f"fanout-{name}", daemon=True)
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.finished = False
+        self.stalled = 0.0  # seconds the scan waited on this consumer
+
+    def _batches(self) -> Iterator[Batch]:
+        while True:
+            batch = self.queue.get()
+            if batch is _END:
+                return
+            yield batch
+
+    def _run(self) -> None:
+        try:
+            self.result = self.fn(self._batches())
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.finished = True
+
+    def put(self, item: Any) -> None:
+        """Queue `item` unless the consumer has already finished."""
+        started = time.perf_counter()
+        while not self.finished:
+            try:
+                self.queue.put(item, timeout=_POLL)
+                break
+            except queue.Full:
+                continue
+        self.stalled += time.perf_counter() - started
+
+
+class FanOut:
+    """Feeds one stream of batches to every registered consumer."""
+
+    def __init__(self, depth: int = 2) -> None:
+        if depth < 1:
+            raise ValueError("depth must be >= 1")
+        self.depth = depth
+        self._sinks: Dict[str, _Sink] = {}
+        self.batches = 0
+        self.rows = 0
+
+    def register(self, name: str, fn: Consumer) -> "FanOut":
+        """Add consumer `fn` under `name` (its result's key in run())."""
+        if name in self._sinks:
+            raise ValueError(f"consumer {name!r} is already registered")
+        self._sinks[name] = _Sink(name, fn, self.depth)
+        return self
+
+    def run(self, batches: Iterable[Batch]) -> Dict[str, Any]:
+        """
+        Read `batches` once, feeding every consumer, and return
+        {name: consumer result}. Re-raises the first consumer error.
+        A FanOut runs once.
+        """
+        if not self._sinks:
+            raise ValueError("no consumers registered")
+        if self.batches or any(s.thread.ident is not None for s in self._sinks.values()):
+            raise RuntimeError("this FanOut has already run")
+        sinks = list(self._sinks.values())
+        for sink in sinks:
+            sink.thread.start()
+
+        iterator = iter(batches)
+        try:
+            for batch in iterator:
+                live = [s for s in sinks if not s.finished]
+                if not live or any(s.error is not None for s in sinks):
+                    break
+                self.batches += 1
+                self.rows += len(batch)
+                for sink in live:
+                    sink.put(batch)
+        finally:
+            for sink in sinks:
+                sink.put(_END)
+            for sink in sinks:
+                sink.thread.join()
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+        for sink in sinks:
+            if sink.error is not None:
+                raise sink.error
+        return {sink.name: sink.result for sink in sinks}
+
+    def stats(self) -> Dict[str, Any]:
+        """Batches/rows read and, per consumer, seconds the scan waited on it."""
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "stalled": {name: sink.stalled for name, sink in self._sinks.items()},
+        }
+
+
+def scan_fan_out(consumers: Dict[str, Consumer], batch_size: int = 1000, depth: int = 2,
+                 where: Optional[Predicate] = None) -> Dict[str, Any]:
+    """
+    Scan user_data once with stream_users_in_batches(batch_size, where=where)
+    and feed every batch to each of `consumers` ({name: fn}).
+    Returns {name: result}.
+    """
+    stream_users_in_batches = __import__("1-batch_processing").stream_users_in_batches
+    fan = FanOut(depth)
+    for name, fn in consumers.items():
+        fan.register(name, fn)
+    return fan.run(stream_users_in_batches(batch_size, where=where))
+
+
+# --------- Ready-made consumers ----------
+def average_age(batches: Iterator[Batch]) -> float:
+    """Mean age over all rows (0.0 for an empty table)."""
+    total = count = 0
+    for batch in batches:
+        total += sum(row["age"] for row in batch)
+        count += len(batch)
+    return float(total) / count if count else 0.0
+
+
+def email_domains(batches: Iterator[Batch]) -> Counter:
+    """Counter of email domains (the part after '@', lower-cased)."""
+    domains: Counter = Counter()
+    for batch in batches:
+        domains.update(str(row["email"]).rpartition("@")[2].lower() for row in batch)
+    return domains
+
+
+def export_csv(path: str, where: Optional[Predicate] = None) -> Consumer:
+    """Consumer writing the rows matching `where` (default: all) to a CSV; returns the row count."""
+
+    def consume(batches: Iterator[Batch]) -> int:
+        written = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["user_id", "name", "email", "age"])
+            writer.writeheader()
+            for batch in batches:
+                rows = batch if where is None else [row for row in batch if where(row)]
+                writer.writerows(rows)
+                written += len(rows)
+        return written
+
+    return consume
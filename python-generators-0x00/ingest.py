@@ -0,0 +1,333 @@
+#!/usr/bin/python3
+"""
+ingest.py
+
+High-throughput CSV ingest for ALX_prodev.user_data — the bulk counterpart
+of seed.insert_data().
+
+insert_data_parallel(csv_path, ...) runs a three-stage pipeline:
+1. the main process reads the CSV in chunks of raw lines;
+2. a pool of worker processes parses the chunks, validates the fields and
+   assigns the UUIDs (the CPU-bound part; UUIDv7 bytes when user_id is
+   BINARY(16), see user_ids.py);
+3. several loader threads, each on its own connection, send the parsed
+   chunks as multi-row `INSERT ... VALUES (...), (...)` statements (or via
+   `LOAD DATA LOCAL INFILE` with load_data=True) and commit periodically.
+
+Every queue between the stages is bounded, so memory stays flat however
+large the file is. Progress (rows/sec) is printed while loading.
+
+Duplicates are handled like insert_data(): the first row per email wins.
+Each parsed chunk is split between the loaders by a hash of the email (as
+the case- and accent-insensitive unique index compares it), so every copy
+of an email goes through the same connection, in file order.
+
+A batch that fails with a deadlock (1213) or lock wait timeout (1205) is
+retried with exponential backoff; the transaction is rolled back and
+everything sent since the last commit is sent again.
+
+Note: chunks are split on line boundaries, so records must not contain
+embedded newlines (true for user_data.csv).
+"""
+
+import csv
+import os
+import queue
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Deque, Iterator, List, Optional, Sequence, Tuple, Union
+
+import mysql.connector
+
+from predicates import collation_key
+from seed import connect_to_prodev
+from user_ids import binary_user_ids, new_user_id, uuid7
+
+
+Row = Tuple[Union[str, bytes], str, str, int]
+Payload = Tuple[int, Union[List[Row], str]]  # (row count, rows or TSV text)
+
+_COLUMNS = "(user_id, name, email, age)"
+_ROW_PLACEHOLDER = "(%s, %s, %s, %s)"
+_DONE = object()
+
+# ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT: retried up to LOCK_RETRIES times
+RETRY_ERRNOS = (1213, 1205)
+LOCK_RETRIES = 5
+RETRY_BACKOFF = 0.05  # seconds before the first retry, doubled after each
+
+
+# --------- Stage 1: chunking (main process) ----------
+def _line_chunks(csv_path: str, chunk_rows: int) -> Iterator[Tuple[str, List[str]]]:
+    """Yield (header_line, [raw data lines]) chunks of at most chunk_rows lines."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        header = f.readline()
+        chunk: List[str] = []
+        for line in f:
+            chunk.append(line)
+            if len(chunk) >= chunk_rows:
+                yield header, chunk
+                chunk = []
+        if chunk:
+            yield header, chunk
+
+
+# --------- Stage 2: parsing (worker processes) ----------
+def _tsv_escape(value: str) -> str:
+    """Escape a field for LOAD DATA's default (tab/newline, backslash) format."""
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _loader_of(email: str, loaders: int) -> int:
+    """The loader (0..loaders-1) that sends every row with this email."""
+    return zlib.crc32(collation_key(email.strip()).encode("utf-8")) % loaders
+
+
+def _new_id(binary_ids: bool, as_hex: bool) -> Union[str, bytes]:
+    """A new user_id for the column layout; as_hex gives BINARY(16) ids as hex text."""
+    if binary_ids and as_hex:
+        return uuid7().hex
+    return new_user_id(binary_ids)
+
+
+def _payload(rows: List[Row], as_tsv: bool) -> Payload:
+    if not as_tsv:
+        return len(rows), rows
+    text = "".join(
+        f"{uid}\t{_tsv_escape(name)}\t{_tsv_escape(email)}\t{age}\n"
+        for uid, name, email, age in rows
+    )
+    return len(rows), text
+
+
+def _parse_chunk(header: str, lines: List[str], as_tsv: bool,
+                 binary_ids: bool = False, loaders: int = 1) -> List[Payload]:
+    """
+    Parse raw CSV lines into (user_id, name, email, age) rows, split by
+    _loader_of(email). Returns one (row_count, rows) per loader or, with
+    as_tsv, (row_count, tsv_text) ready for LOAD DATA (BINARY(16) ids as
+    hex). Runs in a worker process.
+    """
+    reader = csv.DictReader([header, *lines])
+    new_id = partial(_new_id, binary_ids, as_tsv)
+    parts: List[List[Row]] = [[] for _ in range(loaders)]
+    for r in reader:
+        email = r["email"].strip()
+        parts[_loader_of(email, loaders)].append((new_id(), r["name"].strip(), email, int(r["age"])))
+    return [_payload(part, as_tsv) for part in parts]
+
+
+# --------- Stage 3: loading (threads, one connection each) ----------
+class _Progress:
+    """Thread-safe row counter that prints rows/sec every `every` seconds."""
+
+    def __init__(self, every: float) -> None:
+        self.every = every
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, n: int) -> None:
+        with self._lock:
+            self.rows += n
+            now = time.perf_counter()
+            if self.every and now - self._last_report >= self.every:
+                self._last_report = now
+                print(f"[ingest] {self.rows} rows, {self.rate():.0f} rows/sec")
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+
+def _insert_rows(cur, rows: Sequence[Row], rows_per_statement: int) -> None:
+    """Send rows as multi-row INSERT statements of rows_per_statement rows."""
+    for start in range(0, len(rows), rows_per_statement):
+        part = rows[start:start + rows_per_statement]
+        sql = (
+            f"INSERT INTO user_data {_COLUMNS} VALUES "
+            + ", ".join([_ROW_PLACEHOLDER] * len(part))
+            + " ON DUPLICATE KEY UPDATE email = email"
+        )
+        cur.execute(sql, [value for row in part for value in row])
+
+
+def _load_tsv(cur, text: str, binary_ids: bool = False) -> None:
+    """Write a parsed chunk to a temp file and LOAD DATA LOCAL INFILE it."""
+    fd, path = tempfile.mkstemp(suffix=".tsv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        # IGNORE keeps the first row per unique email, like insert_data()
+        columns = "(@user_id, name, email, age) SET user_id = UNHEX(@user_id)" \
+            if binary_ids else _COLUMNS
+        cur.execute(
+            "LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data "
+            "CHARACTER SET utf8mb4 " + columns,
+            (path,),
+        )
+    finally:
+        os.remove(path)
+
+
+def _send_retrying(conn, send, sent: List, payload) -> None:
+    """
+    send(payload), then append it to `sent` (what this connection sent since
+    its last commit). On a deadlock or lock wait timeout roll back and send
+    all of `sent` plus `payload` again, backing off, up to LOCK_RETRIES times.
+    """
+    todo = [payload]
+    for attempt in range(LOCK_RETRIES + 1):
+        try:
+            for item in todo:
+                send(item)
+            sent.append(payload)
+            return
+        except mysql.connector.Error as e:
+            if e.errno not in RETRY_ERRNOS or attempt == LOCK_RETRIES:
+                raise
+            # A deadlock rolls back the whole transaction, not just the statement
+            conn.rollback()
+            print(f"[ingest] {e.msg}; retrying ({attempt + 1}/{LOCK_RETRIES})")
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+            todo = [*sent, payload]
+
+
+def _loader(work: "queue.Queue", progress: _Progress, errors: List[BaseException],
+            load_data: bool, rows_per_statement: int, commit_every: int,
+            binary_ids: bool = False) -> None:
+    """Loader thread: drain `work` over one connection, committing periodically."""
+    conn = connect_to_prodev(allow_local_infile=load_data)
+    got_done = False
+    try:
+        if conn is None:
+            raise RuntimeError("could not connect to ALX_prodev")
+        cur = conn.cursor()
+
+        def send(payload) -> None:
+            if load_data:
+                _load_tsv(cur, payload, binary_ids)
+            else:
+                _insert_rows(cur, payload, rows_per_statement)
+
+        sent: List = []
+        uncommitted = 0
+        while True:
+            item = work.get()
+            if item is _DONE:
+                got_done = True
+                break
+            if errors:
+                continue  # keep draining so the producer never blocks forever
+            count, payload = item
+            _send_retrying(conn, send, sent, payload)
+            uncommitted += count
+            if uncommitted >= commit_every:
+                conn.commit()
+                sent.clear()
+                uncommitted = 0
+            progress.add(count)
+        conn.commit()
+        cur.close()
+    except BaseException as e:  # surfaced by insert_data_parallel()
+        errors.append(e)
+        # Keep consuming so the producer can finish handing out work
+        while not got_done and work.get() is not _DONE:
+            pass
+    finally:
+        if conn is not None:
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+
+
+def _binary_user_ids() -> bool:
+    """Whether user_data.user_id is BINARY(16), checked on a short-lived connection."""
+    conn = connect_to_prodev()
+    if conn is None:
+        raise RuntimeError("could not connect to ALX_prodev")
+    try:
+        return binary_user_ids(conn)
+    finally:
+        conn.close()
+
+
+def insert_data_parallel(csv_path: str, workers: Optional[int] = None, connections: int = 4,
+                         chunk_rows: int = 10000, rows_per_statement: int = 1000,
+                         commit_every: int = 50000, load_data: bool = False,
+                         progress_every: float = 5.0) -> int:
+    """
+    Bulk-load a user_data CSV (headers: name,email,age) and return the
+    number of rows sent.
+
+    Args:
+        csv_path: path to the CSV file
+        workers: parser processes (default: os.cpu_count())
+        connections: loader threads / MySQL connections
+        chunk_rows: CSV lines per parse chunk
+        rows_per_statement: rows per multi-row INSERT
+        commit_every: rows per connection between commits
+        load_data: use LOAD DATA LOCAL INFILE (server needs local_infile=ON)
+        progress_every: seconds between progress lines (0 disables them)
+    """
+    if min(connections, chunk_rows, rows_per_statement, commit_every) < 1:
+        raise ValueError("connections, chunk_rows, rows_per_statement and commit_every must be >= 1")
+
+    workers = workers or os.cpu_count() or 1
+    binary = _binary_user_ids()
+    progress = _Progress(progress_every)
+    errors: List[BaseException] = []
+    # One queue per loader: loader i gets the rows _loader_of() assigns to it
+    queues: List["queue.Queue"] = [queue.Queue(maxsize=2) for _ in range(connections)]
+    loaders = [
+        threading.Thread(
+            target=_loader,
+            args=(work, progress, errors, load_data, rows_per_statement, commit_every, binary),
+            daemon=True,
+        )
+        for work in queues
+    ]
+    for t in loaders:
+        t.start()
+
+    def hand_out(parts: List[Payload]) -> None:
+        for work, part in zip(queues, parts):
+            if part[0]:
+                work.put(part)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Bounded window of parse jobs (Executor.map would submit the whole file);
+            # results are handed out in file order, so the first row per email wins
+            pending: Deque[Future] = deque()
+            for header, lines in _line_chunks(csv_path, chunk_rows):
+                if errors:
+                    break
+                pending.append(pool.submit(_parse_chunk, header, lines, load_data, binary, connections))
+                if len(pending) >= workers * 2:
+                    hand_out(pending.popleft().result())
+            while pending and not errors:
+                hand_out(pending.popleft().result())
+            for f in pending:
+                f.cancel()
+    finally:
+        for work in queues:
+            work.put(_DONE)
+        for t in loaders:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    print(f"[ingest] done: {progress.rows} rows, {progress.rate():.0f} rows/sec")
+    return progress.rows
+
+
+if __name__ == "__main__":
+    insert_data_parallel("user_data.csv")
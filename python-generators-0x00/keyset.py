@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+"""
+keyset.py
+
+Keyset (seek) pagination helpers shared by the user_data generators.
+
+Instead of LIMIT/OFFSET (which makes the server walk and discard every
+skipped row), a keyset walk remembers the ordering key of the last row it
+saw and asks for rows strictly after it. With an index on the ordering key
+every page costs one index seek, no matter how deep into the table it is.
+
+- ORDER_KEYS: supported ordering keys -> the (unique) column tuple they sort on
+- order_clause(order_by): "ORDER BY ..." fragment for an ordering key
+- seek_clause(order_by, after): WHERE fragment + params that seek past a key
+- seek_query(select, order_by, after, where, limit): a full ordered query
+  that seeks past `after` and ANDs an optional extra WHERE fragment
+- key_of(row, order_by): extract the ordering key values from a dict row
+- encode_token(order_by, values) / decode_token(token, order_by): opaque
+  continuation tokens callers can hand back to resume a walk
+- Page: a list of rows that also carries the token for the next page
+"""
+
+import base64
+import binascii
+import json
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from user_ids import to_param
+
+
+# Every ordering key ends with user_id (the primary key) so it is unique and
+# the walk never skips or repeats rows that share a name.
+ORDER_KEYS: Dict[str, Tuple[str, ...]] = {
+    "user_id": ("user_id",),
+    "name": ("name", "user_id"),
+    "updated_at": ("updated_at", "user_id"),
+}
+
+
+def _columns(order_by: str) -> Tuple[str, ...]:
+    """Return the column tuple for `order_by` or raise ValueError."""
+    try:
+        return ORDER_KEYS[order_by]
+    except KeyError:
+        raise ValueError(
+            f"unsupported order_by {order_by!r}; expected one of {sorted(ORDER_KEYS)}"
+        ) from None
+
+
+def order_clause(order_by: str) -> str:
+    """ORDER BY fragment matching the seek predicate for `order_by`."""
+    return "ORDER BY " + ", ".join(_columns(order_by))
+
+
+def seek_clause(order_by: str, after: Sequence[Any]) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Build a WHERE fragment selecting rows strictly after `after`.
+
+    Uses the expanded form `(a > x) OR (a = x AND b > y)` rather than a row
+    constructor so MySQL can turn it into an index range scan.
+    Returns (sql_fragment, params).
+    """
+    columns = _columns(order_by)
+    if len(after) != len(columns):
+        raise ValueError(f"expected {len(columns)} key values for {order_by!r}")
+
+    parts: List[str] = []
+    params: List[Any] = []
+    for i, column in enumerate(columns):
+        terms = [f"{prev} = %s" for prev in columns[:i]] + [f"{column} > %s"]
+        parts.append("(" + " AND ".join(terms) + ")")
+        params.extend(after[: i + 1])
+    return "(" + " OR ".join(parts) + ")", tuple(params)
+
+
+def seek_query(select: str, order_by: str, after: Optional[Sequence[Any]] = None,
+               where: Optional[Tuple[str, Tuple[Any, ...]]] = None,
+               limit: Optional[int] = None,
+               binary_ids: bool = False) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Compose `select` ("SELECT ... FROM user_data") with the seek predicate
+    for `after` (None = from the start), an optional extra (sql, params)
+    condition, the matching ORDER BY and an optional LIMIT.
+    binary_ids=True sends the user_id part of `after` as BINARY(16) bytes
+    (keys and tokens always hold the text form, see user_ids.py).
+    Returns (sql, params).
+    """
+    conditions: List[str] = []
+    params: Tuple[Any, ...] = ()
+    if after is not None:
+        if binary_ids:
+            after = [to_param(v, True) if c == "user_id" else v
+                     for c, v in zip(_columns(order_by), after)]
+        clause, seek_params = seek_clause(order_by, after)
+        conditions.append(clause)
+        params += seek_params
+    if where is not None:
+        conditions.append(where[0])
+        params += tuple(where[1])
+    sql = select
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " " + order_clause(order_by)
+    if limit is not None:
+        sql += " LIMIT %s"
+        params += (limit,)
+    return sql + ";", params
+
+
+def key_of(row: Mapping[str, Any], order_by: str) -> Tuple[Any, ...]:
+    """Ordering key values of a dict row."""
+    return tuple(row[column] for column in _columns(order_by))
+
+
+def encode_token(order_by: str, values: Sequence[Any]) -> str:
+    """Encode the last seen key as an opaque, URL-safe continuation token."""
+    raw = json.dumps({"k": order_by, "v": list(values)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_token(token: str, order_by: str) -> Tuple[Any, ...]:
+    """
+    Decode a token produced by encode_token().
+    Raises ValueError if it is malformed or was issued for another ordering.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        key, values = payload["k"], payload["v"]
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError("invalid continuation token") from e
+    if key != order_by:
+        raise ValueError(f"token was issued for order_by={key!r}, not {order_by!r}")
+    _columns(order_by)
+    return tuple(values)
+
+
+class Page(list):
+    """A page of dict rows plus `next_token` to continue after its last row."""
+
+    def __init__(self, rows: Sequence[Dict[str, object]] = (), next_token: Optional[str] = None):
+        super().__init__(rows)
+        self.next_token = next_token
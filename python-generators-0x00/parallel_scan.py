@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+"""
+parallel_scan.py
+
+Range-partitioned parallel scans of user_data.
+
+A full scan through stream_users() runs on one connection and one core.
+parallel_scan() splits the table into N disjoint key ranges and streams
+each range over its own connection on its own thread:
+
+- key="user_id": ranges split the UUID hex space evenly (UUIDv4 strings
+  are uniformly distributed), no query needed to plan them; time-ordered
+  BINARY(16) ids (user_ids.py) are clustered, so they are sampled instead;
+- key="name": boundaries are quantiles of a random sample of names, taken
+  in the server's collation order (utf8mb4_unicode_ci is case-insensitive,
+  so Python's codepoint order would give overlapping ranges).
+
+ordered=False yields batches as soon as any range produces them; ordered=True
+splits on name and streams the ranges back to back: they are disjoint and
+consecutive in collation order, so no client-side merge (which would compare
+codepoints, not the collation) is needed. map_partitions()
+runs an aggregate per range in parallel and returns the partial results, to
+be merged afterwards (see streaming_stats.RunningStats.merge).
+
+The threads mostly wait on the network, so they overlap well; speedup
+keeps growing until the server's CPU or I/O is the bottleneck.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple, TypeVar
+
+from db_pool import ConnectionPool, connect_kwargs
+from keyset import seek_query
+from prefetch import interleaved, start_prefetch
+from user_ids import binary_user_ids, text_row
+
+
+T = TypeVar("T")
+KeyRange = Tuple[Optional[Any], Optional[Any]]  # [low, high); None = unbounded
+
+SELECT_USERS = "SELECT user_id, name, email, age FROM user_data"
+PARTITION_KEYS = ("user_id", "name")
+
+
+def _check_key(key: str) -> None:
+    if key not in PARTITION_KEYS:
+        raise ValueError(f"unsupported partition key {key!r}; expected one of {PARTITION_KEYS}")
+
+
+def _ranges_from_bounds(bounds: List[Any]) -> List[KeyRange]:
+    """Turn sorted split points into consecutive [low, high) ranges."""
+    edges: List[Optional[Any]] = [None, *bounds, None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _hex_ranges(partitions: int) -> List[KeyRange]:
+    """Even split of the hex space of random CHAR(36) UUIDs."""
+    return _ranges_from_bounds([f"{i * 0x10000 // partitions:04x}" for i in range(1, partitions)])
+
+
+def key_ranges(partitions: int, key: str = "user_id", pool: Optional[ConnectionPool] = None,
+               sample_size: int = 10000) -> List[KeyRange]:
+    """
+    Split user_data into about `partitions` disjoint [low, high) ranges of `key`.
+    Name ranges (and BINARY(16) user_id ranges) come from a random sample
+    sorted by the server, so the bounds follow the column's collation
+    (needs `pool`); there may be fewer than requested if values repeat heavily.
+    Without a pool, user_id is assumed to be the CHAR(36) layout.
+    """
+    _check_key(key)
+    if partitions < 1:
+        raise ValueError("partitions must be >= 1")
+    if key == "user_id" and pool is None:
+        return _hex_ranges(partitions)
+
+    if pool is None:
+        raise ValueError("name ranges need a connection pool to sample from")
+    with pool.connection() as conn:
+        if key == "user_id" and not binary_user_ids(conn):
+            return _hex_ranges(partitions)
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM user_data;")
+        total = cur.fetchone()[0]
+        fraction = min(1.0, sample_size / total) if total else 1.0
+        # `key` is one of PARTITION_KEYS (checked above)
+        cur.execute(f"SELECT {key} FROM user_data WHERE RAND() < %s ORDER BY {key};", (fraction,))
+        sample = [bytes(v) if isinstance(v, bytearray) else v for (v,) in cur.fetchall()]
+        cur.close()
+    if not sample:
+        return [(None, None)]
+    # Already in collation order: keep it, only drop repeated split points
+    bounds = list(dict.fromkeys(sample[i * len(sample) // partitions] for i in range(1, partitions)))
+    return _ranges_from_bounds(bounds)
+
+
+def _range_where(key: str, key_range: KeyRange) -> Optional[Tuple[str, Tuple[Any, ...]]]:
+    """WHERE fragment selecting `key_range` (None for the unbounded range)."""
+    low, high = key_range
+    terms: List[str] = []
+    params: List[Any] = []
+    if low is not None:
+        terms.append(f"{key} >= %s")
+        params.append(low)
+    if high is not None:
+        terms.append(f"{key} < %s")
+        params.append(high)
+    if not terms:
+        return None
+    return " AND ".join(terms), tuple(params)
+
+
+def scan_range(pool: ConnectionPool, key_range: KeyRange, key: str = "user_id",
+               order_by: Optional[str] = None, select: str = SELECT_USERS,
+               batch_size: int = 1000) -> Generator[List[Dict[str, object]], None, None]:
+    """
+    Stream one key range in batches of dict rows over a pooled connection,
+    ordered by `order_by` (default: the partition key, i.e. an index range scan).
+    BINARY(16) user_ids are returned as UUID strings.
+    """
+    with pool.connection() as conn:
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute(*seek_query(select, order_by or key, where=_range_where(key, key_range)))
+            for batch in iter(lambda: cur.fetchmany(batch_size), []):
+                yield list(map(text_row, batch)) if "user_id" in batch[0] else batch
+        finally:
+            cur.close()
+
+
+def parallel_scan(partitions: int = 4, key: str = "user_id", ordered: bool = False,
+                  batch_size: int = 1000, depth: int = 2
+                  ) -> Generator[List[Dict[str, object]], None, None]:
+    """
+    Scan all of user_data over `partitions` connections in parallel,
+    yielding batches of dict rows.
+
+    Args:
+        partitions: number of key ranges / connections / threads
+        key: "user_id" or "name" (how the table is split; ordered=True
+            always splits on name)
+        ordered: yield rows in (name, user_id) order by streaming the name
+            ranges one after another (all of them fetch ahead in parallel);
+            otherwise batches arrive in whatever order the ranges produce them
+        batch_size: rows per fetch and per yielded batch
+        depth: batches buffered ahead (per range when ordered)
+    """
+    _check_key(key)
+    if ordered:
+        key = "name"
+    pool = ConnectionPool(size=partitions, **connect_kwargs())
+    try:
+        ranges = key_ranges(partitions, key, pool)
+        if not ordered:
+            sources = [scan_range(pool, r, key, batch_size=batch_size) for r in ranges]
+            yield from interleaved(sources, depth * len(sources))
+            return
+
+        fetchers = []
+        try:
+            # Started now, not on first use: later ranges fetch while earlier ones are read
+            for r in ranges:
+                fetchers.append(start_prefetch(scan_range(pool, r, key, batch_size=batch_size), depth))
+            # Range i sorts entirely before range i + 1 in the server's collation
+            rows = chain.from_iterable(map(chain.from_iterable, fetchers))
+            yield from iter(lambda: list(islice(rows, batch_size)), [])
+        finally:
+            # Stop the per-range threads before the pool goes away
+            for fetcher in fetchers:
+                fetcher.close()
+    finally:
+        pool.close_all()
+
+
+def map_partitions(fn: Callable[[Iterable[Dict[str, object]]], T], partitions: int = 4,
+                   key: str = "user_id", select: str = SELECT_USERS,
+                   batch_size: int = 1000) -> List[T]:
+    """
+    Run fn(rows) on every key range in parallel, each over its own
+    connection, and return the partial results (one per range) for the
+    caller to merge.
+    """
+    _check_key(key)
+    pool = ConnectionPool(size=partitions, **connect_kwargs())
+    try:
+        ranges = key_ranges(partitions, key, pool)
+
+        def run(key_range: KeyRange) -> T:
+            batches = scan_range(pool, key_range, key, select=select, batch_size=batch_size)
+            return fn(chain.from_iterable(batches))
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            return list(executor.map(run, ranges))
+    finally:
+        pool.close_all()
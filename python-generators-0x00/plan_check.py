@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+"""
+plan_check.py
+
+EXPLAIN every generator query and fail if its plan is not the one the
+schema was designed for (see seed.INDEXES).
+
+Each check names the index the query must use and fails when MySQL plans
+a full table scan (type ALL), a filesort, or another index; `covering`
+checks additionally require "Using index" (no clustered row lookups).
+paginate_users is left out: its unordered LIMIT/OFFSET query is fixed by
+the task and has no index to use.
+
+    python3 plan_check.py            # exit status 1 if any check fails
+
+Run it against a seeded table: on a near-empty table the optimizer may
+prefer a scan whatever the indexes are.
+
+- checks(binary_ids): the queries, built with the helpers the generators use
+- run_checks(conn): list of PlanResult (plan rows and problems per check)
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from keyset import seek_query
+from parallel_scan import SELECT_USERS, _range_where
+from predicates import Age
+from user_ids import binary_user_ids, to_param
+
+_batch = __import__("1-batch_processing")
+
+_SOME_ID = "00000000-0000-7000-8000-000000000000"
+_LAST_ID = "80000000-0000-7000-8000-000000000000"
+
+
+class Check(NamedTuple):
+    name: str
+    query: Tuple[str, Tuple[Any, ...]]
+    index: str
+    covering: bool = False
+
+
+class PlanResult(NamedTuple):
+    check: Check
+    plan: List[Dict[str, Any]]
+    problems: List[str]
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def checks(binary_ids: bool = False) -> List[Check]:
+    """The generator queries with representative parameters."""
+    key = ("M", _SOME_ID)
+    return [
+        Check("stream_users", seek_query(SELECT_USERS, "name"), "idx_name_cover", covering=True),
+        Check("stream_users (resume)",
+              seek_query(SELECT_USERS, "name", key, binary_ids=binary_ids),
+              "idx_name_cover", covering=True),
+        Check("stream_users_in_batches (Age > 25)",
+              _batch._select_users(Age > 25, key, binary_ids), "idx_name_cover", covering=True),
+        Check("seed.stream_users",
+              ("SELECT user_id, name, email, age FROM user_data ORDER BY name;", ()),
+              "idx_name_cover", covering=True),
+        Check("stream_user_ages", ("SELECT age FROM user_data;", ()), "idx_age", covering=True),
+        Check("lazy_paginate keyset (user_id)",
+              seek_query("SELECT * FROM user_data", "user_id",
+                         (to_param(_SOME_ID, binary_ids),), limit=100),
+              "PRIMARY"),
+        Check("lazy_paginate keyset (name)",
+              seek_query("SELECT * FROM user_data", "name", key, limit=100, binary_ids=binary_ids),
+              "idx_name_cover"),
+        Check("stream_user_changes",
+              seek_query("SELECT user_id, name, email, age, updated_at FROM user_data",
+                         "updated_at", ("2999-01-01 00:00:00", _SOME_ID),
+                         where=("updated_at <= NOW(6)", ()), binary_ids=binary_ids),
+              "idx_updated_at"),
+        Check("parallel_scan range (user_id)",
+              seek_query(SELECT_USERS, "user_id",
+                         where=_range_where("user_id", (to_param(_SOME_ID, binary_ids),
+                                                        to_param(_LAST_ID, binary_ids)))),
+              "PRIMARY"),
+    ]
+
+
+def problems_of(check: Check, plan: Sequence[Dict[str, Any]]) -> List[str]:
+    """Why `plan` (EXPLAIN rows) is not acceptable for `check` (empty if it is)."""
+    problems: List[str] = []
+    for row in plan:
+        if row.get("table") != "user_data":
+            continue
+        extra = row.get("Extra") or ""
+        if row.get("type") == "ALL":
+            problems.append("full table scan")
+        if "filesort" in extra:
+            problems.append("filesort")
+        if row.get("key") != check.index:
+            problems.append(f"uses {row.get('key')!r}, expected {check.index!r}")
+        if check.covering and "Using index" not in extra:
+            problems.append("not covered by the index")
+    return problems
+
+
+def run_checks(conn, only: Optional[Sequence[str]] = None) -> List[PlanResult]:
+    """EXPLAIN each check (or the named ones) on `conn`."""
+    results: List[PlanResult] = []
+    cur = conn.cursor(dictionary=True, buffered=True)
+    try:
+        for check in checks(binary_user_ids(conn)):
+            if only and check.name not in only:
+                continue
+            sql, params = check.query
+            cur.execute("EXPLAIN " + sql, params)
+            plan = cur.fetchall()
+            results.append(PlanResult(check, plan, problems_of(check, plan)))
+    finally:
+        cur.close()
+    return results
+
+
+def main() -> int:
+    from db_pool import pooled_connection
+
+    with pooled_connection() as conn:
+        results = run_checks(conn)
+    for result in results:
+        row = next((r for r in result.plan if r.get("table") == "user_data"), {})
+        status = "ok  " if result.ok else "FAIL"
+        print(f"{status} {result.check.name:<36} type={row.get('type')} key={row.get('key')} "
+              f"extra={row.get('Extra')}")
+        for problem in result.problems:
+            print(f"       - {problem}")
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/python3
+"""
+predicates.py
+
+A tiny predicate API for filtering user_data rows, with SQL pushdown.
+
+    from predicates import Age, Name, where_fn
+    Age > 25
+    (Age >= 18) & (Age < 65) | Name.isin(["Ada", "Alan"])
+    ~(Age > 25)
+    where_fn(lambda row: row["email"].endswith(".org"))   # client-side only
+
+Simple comparisons and their &, |, ~ combinations compile to parameterized
+SQL (`to_sql()`), so the server filters rows before they cross the wire.
+Anything that cannot be expressed in SQL (where_fn) is evaluated on the
+client. split() separates a predicate into the part that can be pushed down
+and the residual that must run locally.
+
+Every predicate can also be evaluated on a dict row (`pred(row)`) or on a
+columnar.ColumnarBatch as a whole (`pred.mask(batch)` -> one 0/1 byte per row).
+`pred.may_match(stats)` checks per-column (min, max) statistics, so readers of
+chunked data (snapshot.py) can skip chunks where no row can match.
+
+The text columns use a case- and accent-insensitive collation on the server
+(utf8mb4_*_ci), so client-side evaluation compares collation_key()s:
+Name == "ada" matches "Ada" and "Adá" in Python as it does in SQL. The key
+only approximates the collation's ordering of punctuation and symbols, so
+<, > on such strings may still disagree at the edges.
+"""
+
+import operator
+import unicodedata
+from typing import Any, Callable, Iterable, List, Mapping, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+SqlFragment = Tuple[str, Tuple[Any, ...]]
+
+# Only these columns may appear in generated SQL
+COLUMN_NAMES = ("user_id", "name", "email", "age")
+TEXT_COLUMNS = ("user_id", "name", "email")
+
+_OPS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def collation_key(value: Any) -> Any:
+    """`value` as a *_ci collation compares it: case folded, accents dropped (strings only)."""
+    if not isinstance(value, str):
+        return value
+    if value.isascii():
+        return value.lower()
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _and_masks(a: bytes, b: bytes) -> bytes:
+    """Row-wise AND of two 0/1 byte masks (done as one big-int operation)."""
+    return (int.from_bytes(a, "big") & int.from_bytes(b, "big")).to_bytes(len(a), "big")
+
+
+def _or_masks(a: bytes, b: bytes) -> bytes:
+    """Row-wise OR of two 0/1 byte masks."""
+    return (int.from_bytes(a, "big") | int.from_bytes(b, "big")).to_bytes(len(a), "big")
+
+
+def _not_mask(a: bytes) -> bytes:
+    """Row-wise NOT of a 0/1 byte mask."""
+    ones = int.from_bytes(b"\x01" * len(a), "big")
+    return (int.from_bytes(a, "big") ^ ones).to_bytes(len(a), "big")
+
+
+class Predicate:
+    """Base class: a boolean condition over a user_data row."""
+
+    def to_sql(self) -> Optional[SqlFragment]:
+        """(sql, params) for a WHERE clause, or None if it cannot be pushed down."""
+        raise NotImplementedError
+
+    def __call__(self, row: Mapping[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def mask(self, batch) -> bytes:
+        """0/1 byte per row of a ColumnarBatch."""
+        return bytes(map(self, batch.to_dicts()))
+
+    def may_match(self, stats: Mapping[str, Tuple[Any, Any]]) -> bool:
+        """
+        False only if no row whose columns lie within `stats`
+        ({column: (min, max)}) can satisfy the predicate.
+        """
+        return True
+
+    def __and__(self, other: "Predicate") -> "Predicate":
+        return And(self, other)
+
+    def __or__(self, other: "Predicate") -> "Predicate":
+        return Or(self, other)
+
+    def __invert__(self) -> "Predicate":
+        return Not(self)
+
+
+class Comparison(Predicate):
+    """`column <op> value`, e.g. Age > 25."""
+
+    def __init__(self, column: str, op: str, value: Any) -> None:
+        if column not in COLUMN_NAMES:
+            raise ValueError(f"unknown column {column!r}")
+        if op not in _OPS:
+            raise ValueError(f"unsupported operator {op!r}")
+        self.column = column
+        self.op = op
+        self.value = value
+        self._text = column in TEXT_COLUMNS
+        self._key = collation_key(value) if self._text else value
+
+    def to_sql(self) -> Optional[SqlFragment]:
+        return f"{self.column} {self.op} %s", (self.value,)
+
+    def __call__(self, row: Mapping[str, Any]) -> bool:
+        value = row.get(self.column)
+        if value is None:
+            return False
+        return _OPS[self.op](collation_key(value) if self._text else value, self._key)
+
+    def mask(self, batch) -> bytes:
+        if np is not None and self.column == "age":
+            return _OPS[self.op](batch.ages(), self.value).tobytes()
+        compare = _OPS[self.op]
+        target = self._key
+        values = getattr(batch, self.column)
+        if self._text:
+            values = map(collation_key, values)
+        return bytes(compare(v, target) for v in values)
+
+    def may_match(self, stats: Mapping[str, Tuple[Any, Any]]) -> bool:
+        """Text column stats are expected as collation_key()s (see snapshot.py)."""
+        if self.column not in stats:
+            return True
+        low, high = stats[self.column]
+        v = self._key
+        try:
+            if self.op == "=":
+                return low <= v <= high
+            if self.op == "!=":
+                return not low == high == v
+            if self.op in ("<", "<="):
+                return _OPS[self.op](low, v)
+            return _OPS[self.op](high, v)
+        except TypeError:
+            return True
+
+    def __repr__(self) -> str:
+        return f"({self.column} {self.op} {self.value!r})"
+
+
+class In(Predicate):
+    """`column IN (values...)`."""
+
+    def __init__(self, column: str, values: Iterable[Any]) -> None:
+        if column not in COLUMN_NAMES:
+            raise ValueError(f"unknown column {column!r}")
+        self.column = column
+        self.values = tuple(values)
+        self._text = column in TEXT_COLUMNS
+        self._keys = frozenset(map(collation_key, self.values) if self._text else self.values)
+
+    def to_sql(self) -> Optional[SqlFragment]:
+        if not self.values:
+            return "FALSE", ()
+        return f"{self.column} IN ({', '.join(['%s'] * len(self.values))})", self.values
+
+    def __call__(self, row: Mapping[str, Any]) -> bool:
+        value = row.get(self.column)
+        return (collation_key(value) if self._text else value) in self._keys
+
+    def mask(self, batch) -> bytes:
+        wanted = self._keys
+        values = getattr(batch, self.column)
+        if self._text:
+            values = map(collation_key, values)
+        return bytes(v in wanted for v in values)
+
+    def may_match(self, stats: Mapping[str, Tuple[Any, Any]]) -> bool:
+        if self.column not in stats:
+            return True
+        low, high = stats[self.column]
+        try:
+            return any(low <= v <= high for v in self._keys)
+        except TypeError:
+            return True
+
+    def __repr__(self) -> str:
+        return f"({self.column} IN {self.values!r})"
+
+
+class And(Predicate):
+    """Both sides must hold."""
+
+    def __init__(self, left: Predicate, right: Predicate) -> None:
+        self.left = left
+        self.right = right
+
+    def to_sql(self) -> Optional[SqlFragment]:
+        left, right = self.left.to_sql(), self.right.to_sql()
+        if left is None or right is None:
+            return None
+        return f"({left[0]} AND {right[0]})", left[1] + right[1]
+
+    def __call__(self, row: Mapping[str, Any]) -> bool:
+        return self.left(row) and self.right(row)
+
+    def mask(self, batch) -> bytes:
+        return _and_masks(self.left.mask(batch), self.right.mask(batch))
+
+    def may_match(self, stats: Mapping[str, Tuple[Any, Any]]) -> bool:
+        return self.left.may_match(stats) and self.right.may_match(stats)
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} & {self.right!r})"
+
+
+class Or(Predicate):
+    """Either side must hold."""
+
+    def __init__(self, left: Predicate, right: Predicate) -> None:
+        self.left = left
+        self.right = right
+
+    def to_sql(self) -> Optional[SqlFragment]:
+        left, right = self.left.to_sql(), self.right.to_sql()
+        if left is None or right is None:
+            return None
+        return f"({left[0]} OR {right[0]})", left[1] + right[1]
+
+    def __call__(self, row: Mapping[str, Any]) -> bool:
+        return self.left(row) or self.right(row)
+
+    def mask(self, batch) -> bytes:
+        return _or_masks(self.left.mask(batch), self.right.mask(batch))
+
+    def may_match(self, stats: Mapping[str, Tuple[Any, Any]]) -> bool:
+        return self.left.may_match(stats) or self.right.may_match(stats)
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} | {self.right!r})"
+
+
+class Not(Predicate):
+    """Negation."""
+
+    def __init__(self, inner: Predicate) -> None:
+        self.inner = inner
+
+    def to_sql(self) -> Optional[SqlFragment]:
+        inner = self.inner.to_sql()
+        if inner is None:
+            return None
+        return f"(NOT {inner[0]})", inner[1]
+
+    def __call__(self, row: Mapping[str, Any]) -> bool:
+        return not self.inner(row)
+
+    def mask(self, batch) -> bytes:
+        return _not_mask(self.inner.mask(batch))
+
+    def __repr__(self) -> str:
+        return f"~{self.inner!r}"
+
+
+class FunctionPredicate(Predicate):
+    """Arbitrary Python test on a dict row; never pushed down."""
+
+    def __init__(self, fn: Callable[[Mapping[str, Any]], bool]) -> None:
+        self.fn = fn
+
+    def to_sql(self) -> Optional[SqlFragment]:
+        return None
+
+    def __call__(self, row: Mapping[str, Any]) -> bool:
+        return bool(self.fn(row))
+
+    def __repr__(self) -> str:
+        return f"where_fn({getattr(self.fn, '__name__', self.fn)!r})"
+
+
+class Column:
+    """Builds predicates with comparison operators: Age > 25, Name == "Ada"."""
+
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        if name not in COLUMN_NAMES:
+            raise ValueError(f"unknown column {name!r}")
+        self.name = name
+
+    def __eq__(self, value: Any) -> Predicate:  # type: ignore[override]
+        return Comparison(self.name, "=", value)
+
+    def __ne__(self, value: Any) -> Predicate:  # type: ignore[override]
+        return Comparison(self.name, "!=", value)
+
+    def __lt__(self, value: Any) -> Predicate:
+        return Comparison(self.name, "<", value)
+
+    def __le__(self, value: Any) -> Predicate:
+        return Comparison(self.name, "<=", value)
+
+    def __gt__(self, value: Any) -> Predicate:
+        return Comparison(self.name, ">", value)
+
+    def __ge__(self, value: Any) -> Predicate:
+        return Comparison(self.name, ">=", value)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def isin(self, values: Iterable[Any]) -> Predicate:
+        return In(self.name, values)
+
+
+UserId = Column("user_id")
+Name = Column("name")
+Email = Column("email")
+Age = Column("age")
+
+
+def where_fn(fn: Callable[[Mapping[str, Any]], bool]) -> Predicate:
+    """Wrap a Python callable as a (client-side only) predicate."""
+    return FunctionPredicate(fn)
+
+
+def _conjuncts(pred: Predicate) -> List[Predicate]:
+    """Flatten nested ANDs into a list of terms."""
+    if isinstance(pred, And):
+        return _conjuncts(pred.left) + _conjuncts(pred.right)
+    return [pred]
+
+
+def _combine(terms: List[Predicate]) -> Optional[Predicate]:
+    """AND a list of terms back together (None for an empty list)."""
+    if not terms:
+        return None
+    combined = terms[0]
+    for term in terms[1:]:
+        combined = And(combined, term)
+    return combined
+
+
+def split(pred: Optional[Predicate]) -> Tuple[Optional[Predicate], Optional[Predicate]]:
+    """
+    Split `pred` into (pushed, residual): `pushed` compiles to SQL, `residual`
+    must be evaluated on the client. Top-level AND terms are split
+    individually; an OR/NOT with any non-pushable part stays client-side whole.
+    """
+    if pred is None:
+        return None, None
+    terms = _conjuncts(pred)
+    pushed = [t for t in terms if t.to_sql() is not None]
+    residual = [t for t in terms if t.to_sql() is None]
+    return _combine(pushed), _combine(residual)
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+"""
+prefetch.py
+
+Run generators ahead of their consumer on background threads.
+
+Without prefetching, the next batch is only requested after the consumer is
+done with the current one, so database round trips and consumer work add
+up. prefetched(source, depth) pulls from `source` on a worker thread into a
+bounded queue, so fetching batch N+1 overlaps with processing batch N.
+interleaved(sources, depth) does the same for several sources at once (one
+thread each, e.g. one per key range of a parallel scan) and yields their
+items in whatever order they arrive. Both are generators, so their threads
+start on the first next(); start_prefetch(source, depth) starts its thread
+right away, for consumers that read several prefetched sources one after
+another and want the later ones fetching already.
+
+- at most `depth` items wait in the queue (plus one per worker that is
+  trying to hand an item over), which bounds memory and throttles producers;
+- an exception raised by a source is re-raised in the consumer;
+- closing the consumer (break, .close(), garbage collection) stops the
+  workers and closes every source on its own worker thread, so the
+  sources' `finally` blocks (cursor / connection cleanup) still run.
+
+Each source is only ever touched by its worker thread, which keeps
+non-thread-safe objects such as a MySQL connection confined to one thread.
+"""
+
+import queue
+import threading
+from typing import Generator, Iterable, List, TypeVar
+
+
+T = TypeVar("T")
+
+_ITEM, _ERROR, _DONE = "item", "error", "done"
+_POLL = 0.1  # seconds between stop checks while the queue is full
+
+
+def _start(sources: List[Iterable[T]], depth: int) -> Generator[T, None, None]:
+    """Start one worker per source now; return the (primed) consumer generator."""
+    if depth < 1:
+        raise ValueError("depth must be >= 1")
+
+    buffer: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(message) -> bool:
+        """Hand a message to the consumer unless it has gone away."""
+        while not stop.is_set():
+            try:
+                buffer.put(message, timeout=_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(source: Iterable[T]) -> None:
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                if not put((_ITEM, item)):
+                    return
+            put((_DONE, None))
+        except BaseException as e:
+            put((_ERROR, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    workers = [
+        threading.Thread(target=produce, args=(source,), name=f"prefetch-{i}", daemon=True)
+        for i, source in enumerate(sources)
+    ]
+    for worker in workers:
+        worker.start()
+    consumer = _consume(buffer, stop, workers)
+    next(consumer)
+    return consumer
+
+
+def _consume(buffer: "queue.Queue", stop: threading.Event,
+             workers: List[threading.Thread]) -> Generator[T, None, None]:
+    try:
+        # Primed by _start(): from here on, closing the consumer stops the workers
+        yield  # type: ignore[misc]
+        running = len(workers)
+        while running:
+            kind, value = buffer.get()
+            if kind == _ITEM:
+                yield value
+            elif kind == _ERROR:
+                raise value
+            else:
+                running -= 1
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+def interleaved(sources: List[Iterable[T]], depth: int = 2) -> Generator[T, None, None]:
+    """Yield the items of all `sources` as they arrive, each read on its own thread."""
+    yield from _start(sources, depth)
+
+
+def prefetched(source: Iterable[T], depth: int = 2) -> Generator[T, None, None]:
+    """Yield the items of `source`, fetched up to `depth` items ahead on a thread."""
+    return interleaved([source], depth)
+
+
+def start_prefetch(source: Iterable[T], depth: int = 2) -> Generator[T, None, None]:
+    """prefetched(), with the worker already running when this returns."""
+    return _start([source], depth)
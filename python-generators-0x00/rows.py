@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+"""
+rows.py
+
+Compact row representations for user_data scans.
+
+A dictionary cursor builds a fresh dict per row, and the generators then
+coerced `age` (DECIMAL) to int per row inside a try/except. Here rows are
+fetched as plain tuples and turned into their final shape by a row factory
+compiled once per scan from a converter table, so each row costs one object
+and one converter call per converted column:
+
+- "dict":  {"user_id": ..., "name": ..., "email": ..., "age": int}
+- "tuple": UserTuple named tuple (immutable, ~half the size of a dict)
+- "slots": UserRow with __slots__ (mutable, no per-instance __dict__)
+
+- COLUMNS / CONVERTERS: default column order and per-column converters
+- row_converters(binary_ids): CONVERTERS plus BINARY(16) user_id -> text
+- row_factory(row_format, columns, converters): tuple -> row callable
+- sort_key(row): (name, user_id) of a row in any format
+"""
+
+from collections import namedtuple
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from user_ids import to_text
+
+
+COLUMNS: Tuple[str, ...] = ("user_id", "name", "email", "age")
+
+# DECIMAL(3,0) NOT NULL -> int; add entries here instead of coercing per row
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {"age": int}
+
+ROW_FORMATS = ("dict", "tuple", "slots")
+
+
+def row_converters(binary_ids: bool = False) -> Dict[str, Callable[[Any], Any]]:
+    """CONVERTERS for the table layout: BINARY(16) user_ids become UUID strings."""
+    return {**CONVERTERS, "user_id": to_text} if binary_ids else CONVERTERS
+
+
+UserTuple = namedtuple("UserTuple", COLUMNS)
+
+
+class UserRow:
+    """A user_data row with fixed attributes and no per-instance dict."""
+
+    __slots__ = COLUMNS
+
+    def __init__(self, user_id: str, name: str, email: str, age: int) -> None:
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __repr__(self) -> str:
+        return (f"UserRow(user_id={self.user_id!r}, name={self.name!r}, "
+                f"email={self.email!r}, age={self.age!r})")
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, UserRow):
+            return NotImplemented
+        return self.as_tuple() == other.as_tuple()
+
+    __hash__ = None  # mutable
+
+    def as_tuple(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, c) for c in COLUMNS)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {c: getattr(self, c) for c in COLUMNS}
+
+
+def row_factory(row_format: str = "dict", columns: Sequence[str] = COLUMNS,
+                converters: Optional[Dict[str, Callable[[Any], Any]]] = None
+                ) -> Callable[[Sequence[Any]], Any]:
+    """
+    Compile a function that turns one fetched tuple into a row of
+    `row_format`, applying `converters` (default CONVERTERS) by column.
+
+    The per-column conversions are generated into a single expression once
+    (like collections.namedtuple does), so the per-row cost is one call
+    with no lookups or exception handling.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"unknown row_format {row_format!r}; expected one of {ROW_FORMATS}")
+    if row_format != "dict" and tuple(columns) != COLUMNS:
+        raise ValueError(f"{row_format!r} rows need the columns {COLUMNS}")
+    converters = CONVERTERS if converters is None else converters
+
+    namespace: Dict[str, Any] = {}
+    values = []
+    for i, column in enumerate(columns):
+        if column in converters:
+            namespace[f"_c{i}"] = converters[column]
+            values.append(f"_c{i}(r[{i}])")
+        else:
+            values.append(f"r[{i}]")
+
+    if row_format == "dict":
+        body = "{" + ", ".join(f"{c!r}: {v}" for c, v in zip(columns, values)) + "}"
+    else:
+        namespace["_cls"] = UserTuple if row_format == "tuple" else UserRow
+        body = "_cls(" + ", ".join(values) + ")"
+    return eval(f"lambda r: {body}", namespace)
+
+
+def sort_key(row: Any) -> Tuple[Any, Any]:
+    """(name, user_id) of a row in any of the ROW_FORMATS."""
+    if isinstance(row, dict):
+        return row["name"], row["user_id"]
+    return row.name, row.user_id
@@ -9,29 +9,58 @@ Prototypes satisfied:
 - create_table(connection)
 - insert_data(connection, data)  # here, 'data' is a CSV filepath string
 
+For large files see ingest.insert_data_parallel(csv_path, ...); for daily
+refreshes with small changes, insert_data(connection, csv_path, incremental=True).
+
 Extra (for the objective): stream_users(connection, batch_size=500)
+  - stream_users(connection, batch_size, unbuffered=True) streams through a
+    server-side cursor with at most `max_in_flight` decoded rows held
+  - adaptive=AdaptiveBatcher(target_bytes=...) sizes fetches by a byte
+    budget or latency target instead of a fixed row count
 """
 
 import csv
-import os
-import uuid
-from typing import Dict, Generator, Iterable, Optional
+from typing import Any, Dict, Generator, Iterable, Optional
 
 import mysql.connector
 from mysql.connector import MySQLConnection
 
+from adaptive import AdaptiveBatcher
+from db_pool import connect_kwargs
+from rows import row_converters, row_factory
+from streaming import drain, in_flight_limit
+from user_ids import binary_user_ids, new_user_id
+
+
+# Set on insert and on any update that changes the row (the change feed's watermark)
+UPDATED_AT_COLUMN = ("updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) "
+                     "ON UPDATE CURRENT_TIMESTAMP(6)")
+
+
+# Secondary indexes, one per generator access path (checked by plan_check.py).
+# InnoDB appends the primary key to every secondary index; naming user_id
+# explicitly in idx_name_cover puts it right after `name`, so the index
+# order matches the (name, user_id) keyset order.
+INDEXES = {
+    # stream_users / stream_users_in_batches / seed.stream_users: ordered by
+    # (name, user_id) and covering all four columns -> no filesort, no row lookups
+    "idx_name_cover": "(name, user_id, email, age)",
+    # stream_user_ages: SELECT age reads this small index instead of the table
+    "idx_age": "(age)",
+    # changes.stream_user_changes: seek past the (updated_at, user_id) watermark
+    "idx_updated_at": "(updated_at)",
+}
+
+# Indexes of earlier schemas that create_table drops from existing tables:
+# idx_user_id duplicated the PRIMARY KEY (a second copy of every user_id)
+LEGACY_INDEXES = ("idx_user_id",)
+
 
 # --------- Prototype 1 ----------
 def connect_db() -> Optional[MySQLConnection]:
     """connects to the mysql database server (no specific database)"""
-    host = os.getenv("MYSQL_HOST", "127.0.0.1")
-    user = os.getenv("MYSQL_USER", "root")
-    password = os.getenv("MYSQL_PASSWORD", None)
-    port = int(os.getenv("MYSQL_PORT", "3306"))
     try:
-        conn = mysql.connector.connect(
-            host=host, user=user, password=password, port=port
-        )
+        conn = mysql.connector.connect(**connect_kwargs(database=None))
         return conn
     except mysql.connector.Error as e:
         print(f"[MySQL Error] connect_db: {e}")
@@ -50,15 +79,16 @@ def create_database(connection: MySQLConnection) -> None:
 
 
 # --------- Prototype 3 ----------
-def connect_to_prodev() -> Optional[MySQLConnection]:
-    """connects the the ALX_prodev database in MYSQL"""
-    host = os.getenv("MYSQL_HOST", "127.0.0.1")
-    user = os.getenv("MYSQL_USER", "root")
-    password = os.getenv("MYSQL_PASSWORD", None)
-    port = int(os.getenv("MYSQL_PORT", "3306"))
+def connect_to_prodev(allow_local_infile: bool = False) -> Optional[MySQLConnection]:
+    """
+    connects the the ALX_prodev database in MYSQL
+    (allow_local_infile=True enables LOAD DATA LOCAL INFILE for ingest.py)
+    Returns a dedicated connection owned by the caller; the generators
+    borrow from the shared pool in db_pool.py instead.
+    """
     try:
         conn = mysql.connector.connect(
-            host=host, user=user, password=password, port=port, database="ALX_prodev"
+            **connect_kwargs(), allow_local_infile=allow_local_infile
         )
         return conn
     except mysql.connector.Error as e:
@@ -67,32 +97,74 @@ def connect_to_prodev() -> Optional[MySQLConnection]:
 
 
 # --------- Prototype 4 ----------
-def create_table(connection: MySQLConnection) -> None:
-    """creates a table user_data if it does not exists with the required fields"""
-    ddl = """
+def create_table(connection: MySQLConnection, binary_ids: bool = False) -> None:
+    """
+    creates a table user_data if it does not exists with the required fields
+
+    binary_ids=True stores user_id as a time-ordered UUIDv7 in BINARY(16)
+    instead of a random CHAR(36) UUIDv4 (see user_ids.py); the generators
+    return the same string ids either way.
+
+    `updated_at` is maintained by MySQL on every insert and real change and
+    is indexed for changes.stream_user_changes(). The secondary indexes in
+    INDEXES serve the generators' access paths (see plan_check.py); an
+    existing table missing the column or any of them is altered to add it,
+    and the redundant LEGACY_INDEXES are dropped in the same ALTER.
+    """
+    # The PRIMARY KEY already indexes user_id; no separate index on it
+    id_type = "BINARY(16)" if binary_ids else "CHAR(36)"
+    ddl = f"""
     CREATE TABLE IF NOT EXISTS user_data (
-        user_id CHAR(36) NOT NULL PRIMARY KEY,
+        user_id {id_type} NOT NULL PRIMARY KEY,
         name    VARCHAR(255) NOT NULL,
         email   VARCHAR(255) NOT NULL,
         age     DECIMAL(3,0) NOT NULL,
+        {UPDATED_AT_COLUMN},
         UNIQUE KEY uq_user_email (email),
-        KEY idx_user_id (user_id)
+        {", ".join(f"KEY {name} {columns}" for name, columns in INDEXES.items())}
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
     """
-    with connection.cursor() as cur:
+    with connection.cursor(buffered=True) as cur:
         cur.execute(ddl)
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+            "AND TABLE_NAME = 'user_data' AND COLUMN_NAME = 'updated_at';"
+        )
+        if not cur.fetchone()[0]:
+            # Tables created before the change feed existed
+            cur.execute(f"ALTER TABLE user_data ADD COLUMN {UPDATED_AT_COLUMN};")
+        cur.execute(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data';"
+        )
+        existing = {row[0] for row in cur.fetchall()}
+        changes = [f"DROP KEY {name}" for name in LEGACY_INDEXES if name in existing]
+        changes += [f"ADD KEY {name} {columns}" for name, columns in INDEXES.items()
+                    if name not in existing]
+        if changes:
+            cur.execute(f"ALTER TABLE user_data {', '.join(changes)};")
     connection.commit()
     # Match your sample output line:
     print("Table user_data created successfully")
 
 
 # --------- Prototype 5 ----------
-def insert_data(connection: MySQLConnection, data) -> None:
+def insert_data(connection: MySQLConnection, data, incremental: bool = False,
+                manifest_path: Optional[str] = None) -> Optional[Dict[str, int]]:
     """
     inserts data in the database if it does not exist.
     In this project, 'data' is a path to 'user_data.csv'.
     Deduplicates by UNIQUE(email).
+    New ids are UUIDv7 bytes if user_id is BINARY(16), UUIDv4 strings otherwise.
+
+    incremental=True only sends rows that are new or whose name/age changed
+    since the last load, tracked in a local manifest (see delta_seed.py),
+    and returns the new/changed/skipped counts.
     """
+    if incremental:
+        from delta_seed import insert_data_incremental
+        return insert_data_incremental(connection, data, manifest_path)
+
     # Accept either a path (string) or an iterable of dicts
     rows_iter: Iterable[Dict[str, str]]
     if isinstance(data, str):
@@ -101,6 +173,7 @@ def insert_data(connection: MySQLConnection, data) -> None:
     else:
         rows_iter = data  # assume iterable of dicts with keys name,email,age
 
+    binary = binary_user_ids(connection)
     sql = """
     INSERT INTO user_data (user_id, name, email, age)
     VALUES (%s, %s, %s, %s)
@@ -110,7 +183,7 @@ def insert_data(connection: MySQLConnection, data) -> None:
     with connection.cursor() as cur:
         batch = []
         for row in rows_iter:
-            user_id = str(uuid.uuid4())
+            user_id = new_user_id(binary)
             name = row["name"].strip()
             email = row["email"].strip()
             age = int(row["age"])
@@ -125,31 +198,52 @@ def insert_data(connection: MySQLConnection, data) -> None:
             cur.executemany(sql, batch)
 
     connection.commit()
+    return None
 
 
 # --------- Generator for the objective ----------
-def stream_users(connection: MySQLConnection, batch_size: int = 500
-                 ) -> Generator[Dict[str, object], None, None]:
+def stream_users(connection: MySQLConnection, batch_size: int = 500,
+                 unbuffered: bool = False, max_in_flight: Optional[int] = None,
+                 row_format: str = "dict", adaptive: Optional[AdaptiveBatcher] = None
+                 ) -> Generator[Any, None, None]:
     """
     Lazily stream rows from user_data as dicts, one by one.
     This meets the 'generator that streams rows one by one' objective.
+
+    By default the cursor is buffered (the whole result is read on
+    execute()). unbuffered=True uses a server-side cursor: rows stay on the
+    server until fetched, `batch_size` (capped by `max_in_flight`) at a time. If the
+    generator is closed early the rest of the result is drained so the
+    caller's connection stays usable.
+
+    row_format: "dict", "tuple" or "slots" (see rows.py); rows are fetched
+    as tuples and `age` is converted by the compiled row factory.
+
+    adaptive: an adaptive.AdaptiveBatcher that picks each fetchmany() size
+    from a byte budget / latency target (capped by `max_in_flight`) instead
+    of `batch_size`; read its stats() for the sizes chosen.
     """
-    cur = connection.cursor(dictionary=True)
+    fetch_size = in_flight_limit(batch_size, max_in_flight)
+    if adaptive is not None and max_in_flight is not None:
+        adaptive.cap(max_in_flight)
+    make_row = row_factory(row_format, converters=row_converters(binary_user_ids(connection)))
+    # The plain cursor() is unbuffered too: ask for each mode explicitly
+    cur = connection.cursor(buffered=not unbuffered)
     try:
         cur.execute("SELECT user_id, name, email, age FROM user_data ORDER BY name;")
         while True:
-            rows = cur.fetchmany(batch_size)
+            rows = adaptive.fetch(cur) if adaptive is not None else cur.fetchmany(fetch_size)
             if not rows:
                 break
             for row in rows:
-                # Convert Decimal to int for convenience
-                if row.get("age") is not None:
-                    try:
-                        row["age"] = int(row["age"])
-                    except Exception:
-                        pass
-                yield row
+                # Decimal age -> int via the converter table
+                yield make_row(row)
     finally:
+        if unbuffered:
+            try:
+                drain(cur, fetch_size)
+            except mysql.connector.Error:
+                pass
         cur.close()
 
 
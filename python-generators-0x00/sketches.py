@@ -0,0 +1,323 @@
+#!/usr/bin/python3
+"""
+sketches.py
+
+Approximate, mergeable aggregates over streamed user_data rows, in a fixed
+amount of state however many rows are scanned (UserSketches defaults: about
+68 KiB, mostly the Count-Min counters).
+
+- HyperLogLog(p): distinct count. 2**p one-byte registers (p=12: 4 KiB);
+  relative standard error about 1.04 / sqrt(2**p) (p=12: ~1.6%).
+- CountMinSketch(width, depth, top_k): frequency estimates and heavy
+  hitters. width*depth 8-byte counters (2048x4: 64 KiB). An estimate never
+  undercounts and exceeds the true count by more than (e / width) * n
+  (2048: ~0.13% of n) with probability at most exp(-depth) (4: ~1.8%).
+  top_k tracks the items with the highest estimates.
+- ReservoirSample(k): a uniform random sample of k items (Algorithm L, so
+  the random draws grow with log(n) instead of n).
+- streaming_stats.KLLSketch: quantiles (rank error ~1.65% with k=200).
+- UserSketches: distinct email domains, top names, age quantiles and a row
+  sample, fed from one pass; sketch_users() / parallel_sketch_users() run it
+  over stream_users_in_batches() or a partitioned parallel scan.
+
+Hashes come from blake2b, not hash(), so sketches built in different
+processes agree and can be merged. merge(other) requires the same
+parameters (p, width/depth); it is exact for HyperLogLog and Count-Min
+(the result equals one sketch over the combined stream).
+"""
+
+import hashlib
+import heapq
+import math
+import random
+from array import array
+from collections.abc import Sequence
+from itertools import islice
+from typing import Any, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from streaming_stats import KLLSketch
+
+T = TypeVar("T")
+
+
+def _hash64(item: Any) -> int:
+    """Stable 64-bit hash of str(item) (identical in every process)."""
+    digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _hash128(item: Any) -> Tuple[int, int]:
+    digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter (Flajolet et al. 2007) on 64-bit hashes."""
+
+    def __init__(self, p: int = 12) -> None:
+        if not 4 <= p <= 18:
+            raise ValueError("p must be within [4, 18]")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, item: Any) -> None:
+        """Fold one item (hashed via str()) into the sketch."""
+        h = _hash64(item)
+        index = h & (self.m - 1)
+        rest = h >> self.p
+        rank = 64 - self.p - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items: Iterable[Any]) -> "HyperLogLog":
+        for item in items:
+            self.add(item)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Register-wise max; same result as one sketch over both streams."""
+        if other.p != self.p:
+            raise ValueError("can only merge HyperLogLogs with the same p")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        """Estimated number of distinct items."""
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting is more accurate here
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def relative_error(self) -> float:
+        """Standard error of count() as a fraction of the true count."""
+        return 1.04 / math.sqrt(self.m)
+
+    def nbytes(self) -> int:
+        return len(self.registers)
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch (Cormode & Muthukrishnan 2005) plus a candidate set
+    for the top_k most frequent items.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4, top_k: int = 10) -> None:
+        if width < 1 or depth < 1 or top_k < 0:
+            raise ValueError("width and depth must be >= 1, top_k >= 0")
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.n = 0
+        self.rows = [array("Q", bytes(8 * width)) for _ in range(depth)]
+        # item -> estimate, pruned back to top_k whenever it reaches 2 * top_k
+        self._candidates: Dict[Any, int] = {}
+        self._threshold = 0
+
+    def _cells(self, item: Any) -> List[int]:
+        h1, h2 = _hash128(item)
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def _estimate_cells(self, cells: List[int]) -> int:
+        return min(row[c] for row, c in zip(self.rows, cells))
+
+    def add(self, item: Any, count: int = 1) -> None:
+        """Count `item` (hashed via str()) `count` more times."""
+        self.n += count
+        cells = self._cells(item)
+        for row, c in zip(self.rows, cells):
+            row[c] += count
+        if self.top_k:
+            self._offer(item, self._estimate_cells(cells))
+
+    def _offer(self, item: Any, estimate: int) -> None:
+        candidates = self._candidates
+        if item in candidates or estimate > self._threshold or len(candidates) < 2 * self.top_k:
+            candidates[item] = estimate
+            if len(candidates) >= 2 * self.top_k:
+                self._prune()
+
+    def _prune(self) -> None:
+        kept = heapq.nlargest(self.top_k, self._candidates.items(), key=lambda kv: kv[1])
+        self._candidates = dict(kept)
+        self._threshold = min(self._candidates.values(), default=0)
+
+    def update(self, items: Iterable[Any]) -> "CountMinSketch":
+        for item in items:
+            self.add(item)
+        return self
+
+    def estimate(self, item: Any) -> int:
+        """Estimated count of `item` (never below the true count)."""
+        return self._estimate_cells(self._cells(item))
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        """Add counters cell by cell and re-rank the union of top-k candidates."""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("can only merge Count-Min sketches with the same width and depth")
+        for mine, theirs in zip(self.rows, other.rows):
+            for c, v in enumerate(theirs):
+                if v:
+                    mine[c] += v
+        self.n += other.n
+        candidates = set(self._candidates) | set(other._candidates)
+        self._candidates = {item: self.estimate(item) for item in candidates}
+        self._prune()
+        return self
+
+    def top(self, k: Optional[int] = None) -> List[Tuple[Any, int]]:
+        """The k (default top_k) items with the highest estimates, as (item, estimate)."""
+        k = self.top_k if k is None else min(k, self.top_k)
+        return heapq.nlargest(k, self._candidates.items(), key=lambda kv: kv[1])
+
+    def error_bound(self) -> Tuple[float, float]:
+        """(additive overcount bound in items, probability of exceeding it)."""
+        return math.e / self.width * self.n, math.exp(-self.depth)
+
+    def nbytes(self) -> int:
+        return sum(row.itemsize * len(row) for row in self.rows)
+
+
+class ReservoirSample(Generic[T]):
+    """Uniform sample of k items from a stream (Li's Algorithm L)."""
+
+    def __init__(self, k: int = 100, seed: Optional[int] = None) -> None:
+        if k < 1:
+            raise ValueError("k must be >= 1")
+        self.k = k
+        self.n = 0
+        self.items: List[T] = []
+        self._rng = random.Random(seed)
+        self._w = 1.0
+        self._next = 0  # 1-based position of the next item to take once full
+
+    def _schedule(self) -> None:
+        """Pick the position of the next item that enters the reservoir."""
+        rng = self._rng
+        self._w *= math.exp(math.log(rng.random()) / self.k)
+        self._next = self.n + int(math.log(rng.random()) / math.log1p(-self._w)) + 1
+
+    def add(self, item: T) -> None:
+        self.n += 1
+        if len(self.items) < self.k:
+            self.items.append(item)
+            if len(self.items) == self.k:
+                self._w = 1.0
+                self._schedule()
+        elif self.n == self._next:
+            self.items[self._rng.randrange(self.k)] = item
+            self._schedule()
+
+    def update(self, items: Iterable[T]) -> "ReservoirSample[T]":
+        """Fold items in; sequences (e.g. batches) skip straight to the next pick."""
+        if not isinstance(items, Sequence):
+            for item in items:
+                self.add(item)
+            return self
+        start = 0
+        while start < len(items) and len(self.items) < self.k:
+            self.add(items[start])
+            start += 1
+        end = self.n + len(items) - start  # stream position of the last item
+        while start < len(items) and self._next <= end:
+            offset = start + (self._next - self.n - 1)
+            self.n = self._next - 1
+            self.add(items[offset])
+            start = offset + 1
+        self.n = end
+        return self
+
+    def merge(self, other: "ReservoirSample[T]") -> "ReservoirSample[T]":
+        """Uniform sample of the combined stream from the two samples."""
+        rng = self._rng
+        mine, theirs = list(self.items), list(other.items)
+        a, b = self.n, other.n
+        merged: List[T] = []
+        while len(merged) < self.k and (mine or theirs):
+            take_mine = rng.random() * (a + b) < a
+            source = mine if (take_mine and mine) or not theirs else theirs
+            merged.append(source.pop(rng.randrange(len(source))))
+            if source is mine:
+                a -= 1
+            else:
+                b -= 1
+        self.items = merged
+        self.n += other.n
+        if len(self.items) == self.k:
+            # Threshold after n items: k-th smallest of n uniforms ~ Beta(k, n - k + 1)
+            self._w = rng.betavariate(self.k, self.n - self.k + 1)
+            self._next = self.n + int(math.log(rng.random()) / math.log1p(-self._w)) + 1
+        return self
+
+
+class UserSketches:
+    """Distinct email domains, top names, age quantiles and a row sample in one pass."""
+
+    def __init__(self, p: int = 12, width: int = 2048, depth: int = 4, top_k: int = 10,
+                 kll_k: int = 200, sample_size: int = 100, seed: Optional[int] = None) -> None:
+        self.domains = HyperLogLog(p)
+        self.names = CountMinSketch(width, depth, top_k)
+        self.ages = KLLSketch(kll_k, seed)
+        self.sample: ReservoirSample[Dict[str, object]] = ReservoirSample(sample_size, seed)
+
+    def add(self, row: Dict[str, object]) -> None:
+        self.domains.add(str(row["email"]).rpartition("@")[2].lower())
+        self.names.add(row["name"])
+        self.ages.add(int(row["age"]))
+        self.sample.add(row)
+
+    def update(self, rows: Iterable[Dict[str, object]]) -> "UserSketches":
+        """Fold rows in; the sample is fed whole sequences so it can skip ahead."""
+        if not isinstance(rows, Sequence):
+            rows = iter(rows)
+            for chunk in iter(lambda: list(islice(rows, 1024)), []):
+                self.update(chunk)
+            return self
+        for row in rows:
+            self.domains.add(str(row["email"]).rpartition("@")[2].lower())
+            self.names.add(row["name"])
+            self.ages.add(int(row["age"]))
+        self.sample.update(rows)
+        return self
+
+    def merge(self, other: "UserSketches") -> "UserSketches":
+        self.domains.merge(other.domains)
+        self.names.merge(other.names)
+        self.ages.merge(other.ages)
+        self.sample.merge(other.sample)
+        return self
+
+    def as_dict(self, qs: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, object]:
+        return {
+            "rows": self.ages.n,
+            "distinct_email_domains": self.domains.count(),
+            "top_names": self.names.top(),
+            "age_quantiles": self.ages.quantiles(qs),
+            "sample": list(self.sample.items),
+            "state_bytes": self.domains.nbytes() + self.names.nbytes(),
+        }
+
+
+def sketch_users(batch_size: int = 1000, **params: Any) -> UserSketches:
+    """UserSketches over one stream_users_in_batches() scan."""
+    stream_users_in_batches = __import__("1-batch_processing").stream_users_in_batches
+    sketches = UserSketches(**params)
+    for batch in stream_users_in_batches(batch_size):
+        sketches.update(batch)
+    return sketches
+
+
+def parallel_sketch_users(partitions: int = 4, **params: Any) -> UserSketches:
+    """UserSketches built per key range in parallel and merged."""
+    from parallel_scan import map_partitions
+
+    parts = map_partitions(lambda rows: UserSketches(**params).update(rows), partitions)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    return merged
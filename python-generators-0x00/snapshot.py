@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+"""
+snapshot.py
+
+Export user_data to a chunked columnar snapshot file and scan it locally.
+
+Offline analysis does not need to hit MySQL on every run: export_snapshot()
+streams the table once through stream_users_in_batches(columnar=True) and
+writes each batch as one chunk; SnapshotReader memory-maps the file and
+yields the same batches (lists of dict rows, or ColumnarBatch) at local
+disk speed.
+
+File layout (all integers little-endian):
+
+    MAGIC
+    chunk 0: user_id | name | email | age
+    chunk 1: ...
+    footer (JSON): format version, columns, row count, per chunk its offset,
+                   row count, section (offset, length) per column and
+                   (min, max) per column (text columns as predicates.collation_key()s)
+    footer length (8 bytes) | MAGIC
+
+String columns are stored as one UTF-8 blob joined by NUL bytes (decoded
+with a single split), `age` as raw uint16 values. The per-chunk min/max
+lets a reader skip chunks a predicate cannot match
+(predicates.Predicate.may_match) before touching their bytes.
+
+    python3 snapshot.py export users.snap [--batch-size N]
+    python3 snapshot.py info users.snap
+
+- export_snapshot(path, batch_size, where): write a snapshot, return the row count
+- SnapshotReader(path): .batches(batch_size, columnar, where), .rows, .chunks
+- stream_snapshot_in_batches(path, batch_size, columnar, where): generator
+  with the stream_users_in_batches interface
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple, Union
+
+from columnar import COLUMNS, ColumnarBatch
+from predicates import TEXT_COLUMNS, Predicate, collation_key
+
+MAGIC = b"USNAP\x00\x01\x00"  # file type marker; the format version is in the footer
+FORMAT_VERSION = 2  # 2: text column stats are predicates.collation_key()s
+_LENGTH = struct.Struct("<Q")
+_STRING_COLUMNS = ("user_id", "name", "email")
+_SEP = "\x00"
+
+Batch = Union[List[Dict[str, object]], ColumnarBatch]
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this module can read."""
+
+
+def _encode_strings(values: List[str]) -> bytes:
+    joined = _SEP.join(values)
+    if joined.count(_SEP) != len(values) - 1:
+        raise ValueError("string values must not contain NUL characters")
+    return joined.encode("utf-8")
+
+
+def _encode_ages(ages: array) -> bytes:
+    if sys.byteorder != "little":
+        ages = array("H", ages)
+        ages.byteswap()
+    return ages.tobytes()
+
+
+def _chunk_stats(batch: ColumnarBatch) -> Dict[str, Tuple[Any, Any]]:
+    """(min, max) per column; text columns as predicates.collation_key()s."""
+    stats: Dict[str, Tuple[Any, Any]] = {}
+    for column in COLUMNS:
+        values = getattr(batch, column)
+        if column in TEXT_COLUMNS:
+            values = [collation_key(v) for v in values]
+        stats[column] = (min(values), max(values))
+    return stats
+
+
+def _write_chunk(f, batch: ColumnarBatch) -> Dict[str, Any]:
+    """Append one chunk at the current position and return its index entry."""
+    entry: Dict[str, Any] = {"offset": f.tell(), "rows": len(batch), "sections": {}}
+    for column in COLUMNS:
+        if column == "age":
+            data = _encode_ages(batch.age)
+        else:
+            data = _encode_strings(getattr(batch, column))
+        entry["sections"][column] = (f.tell(), len(data))
+        f.write(data)
+    entry["stats"] = _chunk_stats(batch)
+    return entry
+
+
+def write_snapshot(path: str, batches: Iterable[ColumnarBatch]) -> int:
+    """
+    Write ColumnarBatch `batches` as a snapshot at `path` (atomically, via a
+    temporary file) and return the number of rows written.
+    """
+    tmp = f"{path}.tmp"
+    chunks: List[Dict[str, Any]] = []
+    try:
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            for batch in batches:
+                if len(batch):
+                    chunks.append(_write_chunk(f, batch))
+            footer = json.dumps({
+                "version": FORMAT_VERSION,
+                "columns": list(COLUMNS),
+                "rows": sum(c["rows"] for c in chunks),
+                "chunks": chunks,
+            }, separators=(",", ":")).encode("utf-8")
+            f.write(footer)
+            f.write(_LENGTH.pack(len(footer)))
+            f.write(MAGIC)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return sum(c["rows"] for c in chunks)
+
+
+def export_snapshot(path: str, batch_size: int = 10000, where: Optional[Predicate] = None) -> int:
+    """
+    Stream user_data (optionally filtered on the server by `where`) into a
+    snapshot at `path`, one chunk per `batch_size` rows. Returns the row count.
+    """
+    stream_users_in_batches = __import__("1-batch_processing").stream_users_in_batches
+    return write_snapshot(path, stream_users_in_batches(batch_size, columnar=True, where=where))
+
+
+class SnapshotReader:
+    """Memory-mapped reader for a snapshot file. Use as a context manager."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._footer = self._read_footer()
+        except (ValueError, OSError) as e:
+            self._file.close()
+            raise SnapshotError(f"{path}: not a readable snapshot ({e})") from e
+        self.columns: Tuple[str, ...] = tuple(self._footer["columns"])
+        self.rows: int = self._footer["rows"]
+        self.chunks: List[Dict[str, Any]] = self._footer["chunks"]
+
+    def _read_footer(self) -> Dict[str, Any]:
+        m = self._map
+        tail = len(MAGIC) + _LENGTH.size
+        if len(m) < len(MAGIC) + tail or m[:len(MAGIC)] != MAGIC or m[-len(MAGIC):] != MAGIC:
+            raise ValueError("bad magic")
+        (length,) = _LENGTH.unpack(m[-tail:-len(MAGIC)])
+        footer = json.loads(m[-tail - length:-tail])
+        if footer.get("version") != FORMAT_VERSION or tuple(footer["columns"]) != COLUMNS:
+            raise ValueError(f"unsupported version/columns {footer.get('version')!r}")
+        return footer
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"SnapshotReader({self.path!r}, rows={self.rows}, chunks={len(self.chunks)})"
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def _section(self, chunk: Dict[str, Any], column: str) -> bytes:
+        offset, length = chunk["sections"][column]
+        return self._map[offset:offset + length]
+
+    def read_chunk(self, chunk: Dict[str, Any]) -> ColumnarBatch:
+        """Decode one chunk of the index into a ColumnarBatch."""
+        strings = [self._section(chunk, c).decode("utf-8").split(_SEP) for c in _STRING_COLUMNS]
+        ages = array("H")
+        ages.frombytes(self._section(chunk, "age"))
+        if sys.byteorder != "little":
+            ages.byteswap()
+        return ColumnarBatch(*strings, ages)
+
+    def batches(self, batch_size: Optional[int] = None, columnar: bool = False,
+                where: Optional[Predicate] = None) -> Generator[Batch, None, None]:
+        """
+        Yield the snapshot in batches of at most `batch_size` rows (default:
+        one batch per chunk). Chunks whose min/max statistics rule out `where`
+        are skipped without being read; remaining rows are filtered locally.
+        """
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("batch_size must be a positive integer")
+        for chunk in self.chunks:
+            if where is not None and not where.may_match(chunk["stats"]):
+                continue
+            batch = self.read_chunk(chunk)
+            if where is not None:
+                batch = batch.filter(where.mask(batch))
+            step = batch_size or max(len(batch), 1)
+            for start in range(0, len(batch), step):
+                part = batch if step >= len(batch) else ColumnarBatch(
+                    batch.user_id[start:start + step], batch.name[start:start + step],
+                    batch.email[start:start + step], batch.age[start:start + step])
+                yield part if columnar else part.to_dicts()
+
+    def info(self) -> Dict[str, Any]:
+        """Path, size, row/chunk counts and table-wide min/max per column."""
+        stats = [chunk["stats"] for chunk in self.chunks]
+        return {
+            "path": self.path,
+            "bytes": len(self._map),
+            "rows": self.rows,
+            "chunks": len(self.chunks),
+            "stats": {c: (min(s[c][0] for s in stats), max(s[c][1] for s in stats))
+                      for c in COLUMNS} if stats else {},
+        }
+
+
+def stream_snapshot_in_batches(path: str, batch_size: Optional[int] = None,
+                               columnar: bool = False, where: Optional[Predicate] = None
+                               ) -> Generator[Batch, None, None]:
+    """stream_users_in_batches() over a snapshot file instead of the database."""
+    with SnapshotReader(path) as reader:
+        yield from reader.batches(batch_size, columnar=columnar, where=where)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="user_data columnar snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="write user_data to a snapshot file")
+    export.add_argument("path")
+    export.add_argument("--batch-size", type=int, default=10000, help="rows per chunk")
+    info = sub.add_parser("info", help="print a snapshot's index summary")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        rows = export_snapshot(args.path, args.batch_size)
+        print(f"Exported {rows} rows to {args.path}")
+    else:
+        with SnapshotReader(args.path) as reader:
+            print(json.dumps(reader.info(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
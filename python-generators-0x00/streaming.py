@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+"""
+streaming.py
+
+Helpers for unbuffered (server-side) streaming from mysql.connector cursors.
+
+A buffered cursor pulls the whole result set into client memory on
+execute(), so a "lazy" generator on top of it still grows with the table.
+An unbuffered cursor (`buffered=False`) leaves the rows on the server and
+decodes them only as they are fetched; reading it in `fetchmany()` chunks
+keeps the number of decoded rows held by the client bounded.
+
+- DEFAULT_FETCH_SIZE: rows per fetchmany() round trip
+- unbuffered_rows(cur, fetch_size, max_in_flight): row iterator over an
+  unbuffered cursor holding at most min(fetch_size, max_in_flight) rows
+- drain(cur, fetch_size): discard unread rows so a shared connection can
+  run its next statement
+"""
+
+from itertools import chain
+from typing import Any, Iterator, Optional
+
+
+DEFAULT_FETCH_SIZE = 1000
+
+
+def in_flight_limit(fetch_size: int, max_in_flight: Optional[int] = None) -> int:
+    """Rows fetched per round trip once `max_in_flight` is applied."""
+    size = fetch_size if max_in_flight is None else min(fetch_size, max_in_flight)
+    if size is None or size < 1:
+        raise ValueError("fetch_size and max_in_flight must be positive integers")
+    return size
+
+
+def unbuffered_rows(cur, fetch_size: int = DEFAULT_FETCH_SIZE,
+                    max_in_flight: Optional[int] = None) -> Iterator[Any]:
+    """
+    Iterate the rows of an executed unbuffered cursor, `fetchmany()` chunk by
+    chunk. At most min(fetch_size, max_in_flight) decoded rows are alive at
+    any time (plus whatever the consumer keeps).
+    """
+    size = in_flight_limit(fetch_size, max_in_flight)
+    return chain.from_iterable(iter(lambda: cur.fetchmany(size), []))
+
+
+def drain(cur, fetch_size: int = DEFAULT_FETCH_SIZE) -> None:
+    """
+    Read and discard what is left of an unbuffered result set.
+    Needed before a connection that outlives the cursor can be reused.
+    """
+    for _ in iter(lambda: cur.fetchmany(fetch_size), []):
+        pass
@@ -0,0 +1,219 @@
+#!/usr/bin/python3
+"""
+streaming_stats.py
+
+One-pass, bounded-memory aggregates for numeric streams such as
+stream_user_ages().
+
+- RunningStats: count, mean and variance (Welford), min, max and an exact
+  histogram (Counter of values; bounded by the number of distinct values,
+  at most 1000 for DECIMAL(3,0) ages).
+- KLLSketch: approximate quantiles in O(k log(n/k)) memory. With the default
+  k=200 the rank error is about 1.65% of n (with high probability).
+- StreamSummary: both of the above fed from one pass.
+
+Every aggregate has merge(other), so partitions scanned separately (e.g. in
+parallel) can be combined afterwards; merging gives the same RunningStats
+result as a single pass over the concatenated stream.
+"""
+
+import math
+import random
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class RunningStats:
+    """Mean/variance (Welford), min/max and exact histogram of a stream."""
+
+    __slots__ = ("count", "mean", "_m2", "min", "max", "histogram")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.histogram: Counter = Counter()
+
+    def add(self, x: float) -> None:
+        """Fold one value into the aggregate."""
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        self.histogram[x] += 1
+
+    def update(self, values: Iterable[float]) -> "RunningStats":
+        """Fold every value of an iterable; returns self for chaining."""
+        for x in values:
+            self.add(x)
+        return self
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Combine another partition into this one (Chan et al. parallel update)."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self._m2 = other.count, other.mean, other._m2
+            self.min, self.max = other.min, other.max
+            self.histogram = Counter(other.histogram)
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.histogram.update(other.histogram)
+        return self
+
+    @property
+    def variance(self) -> float:
+        """Population variance (0.0 for fewer than one value)."""
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def sample_variance(self) -> float:
+        """Unbiased sample variance (0.0 for fewer than two values)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        """Population standard deviation."""
+        return math.sqrt(self.variance)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "variance": self.variance,
+            "stddev": self.stddev,
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Items live in a stack of compactors; an item at level h stands for 2**h
+    inputs. When the sketch is over capacity the lowest full level is sorted
+    and every other item (random offset) is promoted, halving it.
+    """
+
+    _C = 2.0 / 3.0
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None) -> None:
+        if k < 8:
+            raise ValueError("k must be >= 8")
+        self.k = k
+        self.n = 0
+        self._levels: List[List[float]] = [[]]
+        self._rng = random.Random(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(2, int(math.ceil(self.k * self._C ** depth)))
+
+    def _size(self) -> int:
+        return sum(len(level) for level in self._levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self._levels)))
+
+    def _compress(self) -> None:
+        while self._size() > self._max_size():
+            for h, items in enumerate(self._levels):
+                if len(items) >= self._capacity(h):
+                    if h + 1 == len(self._levels):
+                        self._levels.append([])
+                    items.sort()
+                    keep = [items.pop()] if len(items) % 2 else []
+                    offset = self._rng.randint(0, 1)
+                    self._levels[h + 1].extend(items[offset::2])
+                    self._levels[h] = keep
+                    break
+
+    def add(self, x: float) -> None:
+        """Fold one value into the sketch."""
+        self.n += 1
+        self._levels[0].append(x)
+        if len(self._levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def update(self, values: Iterable[float]) -> "KLLSketch":
+        for x in values:
+            self.add(x)
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Combine another sketch (any k) into this one."""
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for h, items in enumerate(other._levels):
+            self._levels[h].extend(items)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def _weighted(self) -> List[Tuple[float, int]]:
+        return sorted((x, 1 << h) for h, items in enumerate(self._levels) for x in items)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate value at quantile q in [0, 1] (None if empty)."""
+        if not 0.0 <= q <= 1.0:
+            raise ValueError("q must be within [0, 1]")
+        weighted = self._weighted()
+        if not weighted:
+            return None
+        total = sum(w for _, w in weighted)
+        target = q * total
+        seen = 0
+        for x, w in weighted:
+            seen += w
+            if seen >= target:
+                return x
+        return weighted[-1][0]
+
+    def quantiles(self, qs: Iterable[float]) -> Dict[float, Optional[float]]:
+        return {q: self.quantile(q) for q in qs}
+
+    def rank(self, x: float) -> float:
+        """Approximate fraction of inputs <= x."""
+        weighted = self._weighted()
+        total = sum(w for _, w in weighted)
+        return sum(w for v, w in weighted if v <= x) / total if total else 0.0
+
+
+class StreamSummary:
+    """RunningStats + KLLSketch fed from the same single pass."""
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None) -> None:
+        self.stats = RunningStats()
+        self.sketch = KLLSketch(k, seed)
+
+    def add(self, x: float) -> None:
+        self.stats.add(x)
+        self.sketch.add(x)
+
+    def update(self, values: Iterable[float]) -> "StreamSummary":
+        for x in values:
+            self.add(x)
+        return self
+
+    def merge(self, other: "StreamSummary") -> "StreamSummary":
+        self.stats.merge(other.stats)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def as_dict(self, qs: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, object]:
+        summary = self.stats.as_dict()
+        summary["quantiles"] = self.sketch.quantiles(qs)
+        return summary
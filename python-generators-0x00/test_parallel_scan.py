@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Unit tests for parallel_scan.py: the ordered scan starts every range's
+fetcher before yielding its first row and keeps the ranges in order.
+The database is replaced by stub ranges.
+"""
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import parallel_scan
+
+RANGES = [(None, "f"), ("f", "p"), ("p", None)]
+ROWS = {
+    RANGES[0]: [{"name": "ada", "user_id": "1"}, {"name": "Eve", "user_id": "2"}],
+    RANGES[1]: [{"name": "grace", "user_id": "3"}],
+    RANGES[2]: [{"name": "Tim", "user_id": "4"}, {"name": "zoe", "user_id": "5"}],
+}
+
+
+class TestOrderedParallelScan(unittest.TestCase):
+    """parallel_scan(ordered=True) over stubbed name ranges."""
+
+    def setUp(self) -> None:
+        self.started = {r: threading.Event() for r in RANGES}
+
+        def scan_range(pool, key_range, key, batch_size=1000, **kwargs):
+            self.started[key_range].set()
+            rows = ROWS[key_range]
+            for i in range(0, len(rows), batch_size):
+                yield rows[i:i + batch_size]
+
+        patches = [
+            patch.object(parallel_scan, "ConnectionPool", Mock()),
+            patch.object(parallel_scan, "connect_kwargs", Mock(return_value={})),
+            patch.object(parallel_scan, "key_ranges", Mock(return_value=RANGES)),
+            patch.object(parallel_scan, "scan_range", scan_range),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_all_ranges_start_before_first_row(self) -> None:
+        """Every range's worker is running once the first batch is out."""
+        scan = parallel_scan.parallel_scan(3, ordered=True, batch_size=1)
+        try:
+            next(scan)
+            for key_range, started in self.started.items():
+                self.assertTrue(started.wait(2.0), f"range {key_range} was not started")
+        finally:
+            scan.close()
+
+    def test_ranges_are_concatenated_in_order(self) -> None:
+        """Rows come out range by range, rebatched to batch_size."""
+        batches = list(parallel_scan.parallel_scan(3, ordered=True, batch_size=2))
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+        self.assertEqual([row["user_id"] for b in batches for row in b],
+                         ["1", "2", "3", "4", "5"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Unit tests for snapshot.py: chunk pruning on collation-key stats and
+rejection of version 1 files, whose text stats are raw strings.
+"""
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import snapshot
+from columnar import ColumnarBatch
+from predicates import Name
+
+ROWS = [
+    ("id-1", "Ada", "ada@example.com", 30),
+    ("id-2", "bob", "bob@example.com", 40),
+]
+
+
+def _raw_stats(batch: ColumnarBatch):
+    """What version 1 wrote: plain min/max, case-sensitive for text."""
+    return {column: (min(getattr(batch, column)), max(getattr(batch, column)))
+            for column in snapshot.COLUMNS}
+
+
+class TestSnapshotVersion(unittest.TestCase):
+    """The format version lives in the footer and is checked on open."""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "users.snap")
+
+    def test_text_predicate_is_not_pruned(self) -> None:
+        """Name == "ada" matches "Ada" as the server's _ci collation does."""
+        snapshot.write_snapshot(self.path, [ColumnarBatch.from_rows(ROWS)])
+        with snapshot.SnapshotReader(self.path) as reader:
+            rows = [row for batch in reader.batches(where=Name == "ada") for row in batch]
+        self.assertEqual([row["user_id"] for row in rows], ["id-1"])
+
+    def test_version_1_file_is_rejected(self) -> None:
+        """A file with raw-string stats is refused rather than pruned with them."""
+        with patch.object(snapshot, "FORMAT_VERSION", 1), \
+                patch.object(snapshot, "_chunk_stats", _raw_stats):
+            snapshot.write_snapshot(self.path, [ColumnarBatch.from_rows(ROWS)])
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.SnapshotReader(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
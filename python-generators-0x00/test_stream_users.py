@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Unit tests for 0-stream_users.py: stream_users(unbuffered=True) keeps
+client memory flat as the table grows, and each mode asks mysql.connector
+for the cursor it needs. The database is replaced by a fake cursor.
+"""
+import tracemalloc
+import unittest
+from decimal import Decimal
+from typing import Any, List, Tuple
+from unittest.mock import MagicMock, Mock, patch
+
+stream_users_module = __import__("0-stream_users")
+
+
+class FakeUnbufferedCursor:
+    """Generates `rows` user_data tuples on demand, fetchmany() chunk by chunk."""
+
+    def __init__(self, rows: int) -> None:
+        self.rows = rows
+        self.sent = 0
+
+    def execute(self, sql: str, params: Tuple[Any, ...] = ()) -> None:
+        self.sent = 0
+
+    def fetchmany(self, size: int) -> List[Tuple[Any, ...]]:
+        end = min(self.sent + size, self.rows)
+        chunk = [(f"{i:08d}-0000-4000-8000-000000000000", f"User {i:08d}",
+                  f"user{i}@example.com", Decimal(18 + i % 80)) for i in range(self.sent, end)]
+        self.sent = end
+        return chunk
+
+    def close(self) -> None:
+        pass
+
+
+def _connection(cursor) -> Mock:
+    conn = Mock()
+    conn.cursor.return_value = cursor
+    return conn
+
+
+class TestStreamUsersMemory(unittest.TestCase):
+    """tracemalloc peak of a full unbuffered scan at 1x and 10x rows."""
+
+    def setUp(self) -> None:
+        self.pool = Mock()
+        patches = [
+            patch.object(stream_users_module, "get_pool", Mock(return_value=self.pool)),
+            patch.object(stream_users_module, "binary_user_ids", Mock(return_value=False)),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def _peak(self, rows: int) -> int:
+        self.pool.acquire.return_value = _connection(FakeUnbufferedCursor(rows))
+        tracemalloc.start()
+        try:
+            seen = sum(1 for _ in stream_users_module.stream_users(unbuffered=True, fetch_size=500))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(seen, rows)
+        return peak
+
+    def test_unbuffered_peak_stays_flat(self) -> None:
+        """10x the rows stays within 1.5x of the 1x peak."""
+        small, large = self._peak(5_000), self._peak(50_000)
+        self.assertLessEqual(large, small * 1.5, f"peak grew from {small} to {large} bytes")
+
+    def test_cursor_modes(self) -> None:
+        """Buffered by default, buffered=False with unbuffered=True."""
+        for unbuffered, buffered in ((False, True), (True, False)):
+            cursor = MagicMock()
+            cursor.__iter__.return_value = iter([])
+            cursor.fetchmany.return_value = []
+            conn = _connection(cursor)
+            self.pool.acquire.return_value = conn
+            list(stream_users_module.stream_users(unbuffered=unbuffered))
+            conn.cursor.assert_called_once_with(buffered=buffered)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+"""
+user_ids.py
+
+user_data primary keys: random CHAR(36) UUIDv4 strings (the original
+layout) or time-ordered UUIDv7 values stored as BINARY(16).
+
+Random keys land all over the clustered index, so inserts split pages
+everywhere and every secondary index (which stores the primary key) pays
+36 bytes per row. UUIDv7 keys start with a millisecond timestamp, so new
+rows append at the right edge of the index, and BINARY(16) stores them in
+16 bytes. seed.create_table(connection, binary_ids=True) picks that layout.
+
+The generators stay layout-agnostic: rows always carry the canonical
+36-character string, and only SQL parameters compared with the column
+(seek keys, range bounds, new ids) are converted to bytes when the table
+uses BINARY(16). Binary and text forms sort the same way (lower-case hex),
+so key order and resume tokens do not depend on the layout.
+
+- uuid7(): a new time-ordered UUID (monotonic within this process)
+- new_user_id(binary): a value ready to insert for either layout
+- to_text(value) / to_param(value, binary): column value <-> canonical string
+- text_row(row): dict row with user_id converted to text (in place)
+- binary_user_ids(conn): whether user_data.user_id is BINARY(16)
+"""
+
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Union
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_seq = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    UUID version 7: 48-bit Unix ms timestamp, 12-bit sequence, 62 random
+    bits. Values from this process are strictly increasing.
+    """
+    global _last_ms, _last_seq
+    ms = time.time_ns() // 1_000_000
+    with _lock:
+        if ms > _last_ms:
+            # Start low in the sequence space to leave room for this millisecond
+            seq = int.from_bytes(os.urandom(2), "big") & 0x3FF
+        else:
+            ms, seq = _last_ms, _last_seq + 1
+            if seq > 0xFFF:
+                ms, seq = ms + 1, 0
+        _last_ms, _last_seq = ms, seq
+    rand = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (seq << 64) | (0b10 << 62) | rand)
+
+
+def new_user_id(binary: bool = False) -> Union[str, bytes]:
+    """A fresh user_id: UUIDv7 bytes for BINARY(16), a UUIDv4 string otherwise."""
+    return uuid7().bytes if binary else str(uuid.uuid4())
+
+
+def to_text(value: Any) -> Any:
+    """Canonical UUID string for a BINARY(16) value; anything else unchanged."""
+    if isinstance(value, (bytes, bytearray)) and len(value) == 16:
+        return str(uuid.UUID(bytes=bytes(value)))
+    return value
+
+
+def to_param(value: Any, binary: bool) -> Any:
+    """A user_id SQL parameter for the table's layout (bytes for BINARY(16))."""
+    if binary and isinstance(value, str):
+        return uuid.UUID(value).bytes
+    return value
+
+
+def text_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a dict row's user_id to text in place and return the row."""
+    row["user_id"] = to_text(row["user_id"])
+    return row
+
+
+def binary_user_ids(conn) -> bool:
+    """True if user_data.user_id in the connection's database is BINARY(16)."""
+    cur = conn.cursor(buffered=True)
+    try:
+        cur.execute(
+            "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_data' "
+            "AND COLUMN_NAME = 'user_id';"
+        )
+        row = cur.fetchone()
+    finally:
+        cur.close()
+    return row is not None and str(row[0]).lower() == "binary"